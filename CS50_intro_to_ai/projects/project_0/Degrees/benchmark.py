@@ -0,0 +1,268 @@
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+import degrees
+import service
+from graph import CompactGraph
+
+
+def compare_modes(directory, samples=100, seed=0):
+    """
+    Runs `shortest_path` in both modes on random pairs of people from
+    `directory` and prints how many people each mode expanded.
+    """
+    degrees.load_data(directory, compact=True)
+    person_ids = list(degrees.graph.person_ids)
+    rng = random.Random(seed)
+
+    totals = {False: [0, 0.0], True: [0, 0.0]}
+    for _ in range(samples):
+        source, target = rng.choice(person_ids), rng.choice(person_ids)
+        lengths = []
+        for bidirectional in (False, True):
+            stats = {}
+            start = time.perf_counter()
+            path = degrees.shortest_path(
+                source, target, bidirectional=bidirectional, stats=stats)
+            totals[bidirectional][0] += stats["expanded"]
+            totals[bidirectional][1] += time.perf_counter() - start
+            lengths.append(None if path is None else len(path))
+        if lengths[0] != lengths[1]:
+            raise Exception(f"path lengths differ for {source}, {target}")
+
+    for bidirectional, name in ((False, "breadth first"),
+                                (True, "bidirectional")):
+        expanded, seconds = totals[bidirectional]
+        print(f"{name}: {expanded / samples:.1f} expanded/query, "
+              f"{1000 * seconds / samples:.3f} ms/query")
+
+
+def cache(directory, samples=100, size=100000, precompute=1000, seed=0):
+    """
+    Times the same random queries without and with the neighbor cache
+    and prints the cache hit rate.
+    """
+    degrees.load_data(directory, compact=True)
+    person_ids = degrees.graph.person_ids
+    rng = random.Random(seed)
+    pairs = [(person_ids[rng.randrange(len(person_ids))],
+              person_ids[rng.randrange(len(person_ids))])
+             for _ in range(samples)]
+
+    for name in ("uncached", "cached"):
+        start = time.perf_counter()
+        if name == "cached":
+            degrees.cache_neighbors(size, precompute)
+        setup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for source, target in pairs:
+            degrees.shortest_path(source, target, bidirectional=True)
+        seconds = time.perf_counter() - start
+        print(f"{name}: {1000 * seconds / samples:.3f} ms/query, "
+              f"{setup:.3f} s setup")
+
+    hits, misses = degrees.neighbor_cache.hits, degrees.neighbor_cache.misses
+    print(f"cache: {hits} hits, {misses} misses, "
+          f"{100 * hits / max(hits + misses, 1):.1f}% hit rate")
+    degrees.neighbor_cache = None
+
+
+def ingest(directory, processes=4):
+    """
+    Parses the CSVs of `directory` with both backends, on one and on
+    `processes` processes, and prints rows per second and bad rows.
+    """
+    for compact in (False, True):
+        for count in (1, processes):
+            stats = {}
+            degrees.load_data(directory, compact=compact, cache=False,
+                              processes=count, stats=stats)
+            name = "compact" if compact else "dict"
+            print(f"{name}, {count} processes: {stats['rows']} rows, "
+                  f"{stats['bad_rows']} bad, {stats['seconds']:.2f} s, "
+                  f"{stats['rows'] / stats['seconds']:.0f} rows/s")
+
+
+def name_lookups(directory, queries=1000, seed=0):
+    """
+    Times prefix completions and suggestions for misspelled names
+    (one character dropped) of random people, and prints how often the
+    intended name is among the suggestions.
+    """
+    degrees.load_data(directory, compact=True)
+    lookup = degrees.name_lookup()
+    rng = random.Random(seed)
+    keys = [lookup.keys[rng.randrange(len(lookup.keys))]
+            for _ in range(queries)]
+    typos = []
+    for key in keys:
+        i = rng.randrange(len(key))
+        typos.append(key[:i] + key[i + 1:])
+
+    start = time.perf_counter()
+    for key in keys:
+        lookup.complete(key[:3])
+    seconds = time.perf_counter() - start
+    print(f"complete: {1000 * seconds / queries:.3f} ms/query")
+
+    start = time.perf_counter()
+    found = sum(key in lookup.suggest(typo) for key, typo in zip(keys, typos))
+    seconds = time.perf_counter() - start
+    print(f"suggest: {1000 * seconds / queries:.3f} ms/query, "
+          f"{100 * found / queries:.1f}% found")
+
+
+def synthetic_graph(size, seed=0):
+    """
+    Returns a random CompactGraph of `size` people, each starring in
+    two of `size // 2` movies.
+    """
+    rng = random.Random(seed)
+    graph = CompactGraph()
+    for i in range(size):
+        graph.add_person(str(i), f"Person {i}", "")
+    movies = max(size // 2, 1)
+    for i in range(movies):
+        graph.add_movie(f"m{i}", f"Movie {i}", "")
+    graph.add_stars(
+        (str(i), f"m{rng.randrange(movies)}")
+        for i in range(size) for _ in range(2)
+    )
+    return graph
+
+
+def legacy_shortest_path(source, target):
+    """
+    Breadth first search as written before the deque frontier and
+    visited set: the frontier is a list sliced on every pop, and
+    visited people are kept in a list.
+    """
+    frontier = []
+    visited = []
+    parent = None
+    while True:
+        for (movie_id, person_id) in degrees.neighbors_for_person(source):
+            if person_id not in visited:
+                frontier.append(degrees.Node(person_id, parent, movie_id))
+        if not frontier:
+            return None
+        node = frontier[0]
+        frontier = frontier[1:]
+        if node.state == target:
+            return node
+        parent = node
+        source = node.state
+        visited.append(node.state)
+
+
+def scaling(sizes=(10 ** 5, 3 * 10 ** 5, 10 ** 6),
+            legacy_sizes=(250, 500, 1000)):
+    """
+    Times a search that has to exhaust synthetic graphs of growing
+    size, for the current and the legacy breadth first search.
+    """
+    for search, name, graph_sizes in (
+        (legacy_shortest_path, "legacy", legacy_sizes),
+        (degrees.shortest_path, "current", sizes)
+    ):
+        for size in graph_sizes:
+            degrees.graph = synthetic_graph(size)
+            start = time.perf_counter()
+            search("0", "missing")
+            seconds = time.perf_counter() - start
+            print(f"{name}: {size:>8} people, {seconds:8.3f} s, "
+                  f"{1e6 * seconds / size:8.2f} us/person")
+    degrees.graph = None
+
+
+def latency(directory, queries=1000, clients=8, seed=0):
+    """
+    Starts the query server on a free port, sends it `queries` random
+    queries from `clients` concurrent clients and prints latency
+    percentiles.
+    """
+    degrees.load_data(directory, compact=True)
+    graph = degrees.graph
+    rng = random.Random(seed)
+    pairs = [
+        (graph.person_ids[rng.randrange(len(graph.person_ids))],
+         graph.person_ids[rng.randrange(len(graph.person_ids))])
+        for _ in range(queries)
+    ]
+
+    server = service.make_server(port=0, workers=clients)
+    port = server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def query(pair):
+        url = (f"http://127.0.0.1:{port}/path?"
+               + urlencode({"source": pair[0], "target": pair[1]}))
+        start = time.perf_counter()
+        with urlopen(url) as response:
+            json.loads(response.read())
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = sorted(pool.map(query, pairs))
+    seconds = time.perf_counter() - start
+    server.shutdown()
+    server.server_close()
+
+    def percentile(p):
+        return 1000 * latencies[min(len(latencies) - 1,
+                                    int(p / 100 * len(latencies)))]
+
+    print(f"{queries} queries, {clients} clients, "
+          f"{queries / seconds:.1f} queries/s")
+    print(f"p50: {percentile(50):.2f} ms, p99: {percentile(99):.2f} ms")
+
+
+def main():
+    usage = ("Usage: python benchmark.py modes [directory] [samples]\n"
+             "       python benchmark.py cache [directory] [samples]\n"
+             "       python benchmark.py ingest [directory] [processes]\n"
+             "       python benchmark.py names [directory] [queries]\n"
+             "       python benchmark.py scaling\n"
+             "       python benchmark.py latency [directory] [queries] "
+             "[clients]")
+    if len(sys.argv) < 2:
+        sys.exit(usage)
+    command, args = sys.argv[1], sys.argv[2:]
+    if command == "modes" and len(args) <= 2:
+        directory = args[0] if args else "large"
+        samples = int(args[1]) if len(args) == 2 else 100
+        compare_modes(directory, samples)
+    elif command == "cache" and len(args) <= 2:
+        directory = args[0] if args else "large"
+        samples = int(args[1]) if len(args) == 2 else 100
+        cache(directory, samples)
+    elif command == "ingest" and len(args) <= 2:
+        directory = args[0] if args else "large"
+        processes = int(args[1]) if len(args) == 2 else 4
+        ingest(directory, processes)
+    elif command == "names" and len(args) <= 2:
+        directory = args[0] if args else "large"
+        queries = int(args[1]) if len(args) == 2 else 1000
+        name_lookups(directory, queries)
+    elif command == "scaling" and not args:
+        scaling()
+    elif command == "latency" and len(args) <= 3:
+        directory = args[0] if args else "large"
+        queries = int(args[1]) if len(args) >= 2 else 1000
+        clients = int(args[2]) if len(args) == 3 else 8
+        latency(directory, queries, clients)
+    else:
+        sys.exit(usage)
+
+
+if __name__ == "__main__":
+    main()
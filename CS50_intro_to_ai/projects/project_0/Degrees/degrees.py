@@ -1,7 +1,13 @@
-import csv
+import gc
+import heapq
 import sys
+import time
 
-from util import Node, StackFrontier, QueueFrontier
+import ingest
+import snapshot
+from graph import CompactGraph
+from lookup import NameIndex
+from util import LRUCache, Node, StackFrontier, QueueFrontier
 
 # Maps names to a set of corresponding person_ids
 # "Jon Doe" -> 23421
@@ -15,57 +21,125 @@ people = {}
 # 
 movies = {}
 
-# keep track of people visited
-vstd_people = []
+# Compact CSR graph, used instead of the dicts above when loaded
+# with compact=True
+graph = None
 
-def load_data(directory):
+# Optional LRUCache of deduplicated neighbors, see cache_neighbors
+neighbor_cache = None
+
+# NameIndex for prefix and misspelled name lookups, see name_lookup
+names_lookup = None
+
+def load_data(directory, compact=False, cache=True, processes=1,
+              stats=None):
     """
     Load data from CSV files into memory.
+
+    If `compact` is true, the data is stored in a `CompactGraph` and
+    `names`, `people` and `movies` become read-only views over it.
+    With `cache`, the compact graph is memory-mapped from a binary
+    snapshot next to the CSVs, which is (re)written whenever it is
+    missing or the CSVs have changed.
+
+    The CSVs are parsed in chunks on `processes` worker processes.
+    If a `stats` dict is given, stores the number of rows read, the
+    number of bad rows skipped (malformed, or starring an unknown
+    person or movie) and the seconds taken.
+    """
+    # Everything allocated while loading stays alive, so the cyclic
+    # garbage collector's passes over it are wasted work
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        read_data(directory, compact, cache, processes, stats)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def read_data(directory, compact, cache, processes, stats):
+    """
+    Does the work of `load_data`.
     """
-    # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
-
-    # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
+    global graph, names, people, movies, neighbor_cache, names_lookup
+    neighbor_cache = None
+    names_lookup = None
+    start = time.perf_counter()
+    if stats is not None:
+        stats.update(rows=0, bad_rows=0)
+    if compact:
+        if cache:
+            graph = snapshot.load_graph(directory, processes, stats)
+        else:
+            graph = CompactGraph.from_csv(directory, processes, stats)
+        names, people, movies = graph.names, graph.people, graph.movies
+        names_lookup = graph.name_lookup
+        if stats is not None:
+            stats["seconds"] = time.perf_counter() - start
+        return
+    if graph is not None:
+        graph = None
+        names, people, movies = {}, {}, {}
+
+    tables = ingest.read_tables(directory, processes)
+    people_table, movies_table, stars = (tables[name]
+                                         for name in ingest.TABLES)
+
+    # Load people, keeping each one's set of movies by person index
+    person_ids = people_table.ids
+    person_movies = [set() for _ in person_ids]
+    for person_id, name, birth, starred in zip(
+            person_ids, *people_table.columns, person_movies):
+        people[person_id] = {
+            "name": name,
+            "birth": birth,
+            "movies": starred
+        }
+    for name, positions in people_table.names.items():
+        names[name] = {person_ids[position] for position in positions}
+
+    # Load movies, keeping each one's set of stars by movie index
+    movie_ids = movies_table.ids
+    movie_stars = [set() for _ in movie_ids]
+    for movie_id, title, year, cast in zip(
+            movie_ids, *movies_table.columns, movie_stars):
+        movies[movie_id] = {
+            "title": title,
+            "year": year,
+            "stars": cast
+        }
 
     # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    for person, movie in zip(stars.people, stars.movies):
+        person_movies[person].add(movie_ids[movie])
+        movie_stars[movie].add(person_ids[person])
+
+    if stats is not None:
+        stats["rows"] = sum(table.rows for table in tables.values())
+        stats["bad_rows"] = sum(
+            table.bad_rows for table in tables.values())
+        stats["seconds"] = time.perf_counter() - start
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    args = sys.argv[1:]
+    flags = [arg for arg in args if arg.startswith("--")]
+    args = [arg for arg in args if not arg.startswith("--")]
+    compact = "--compact" in flags
+    bidirectional = "--bidirectional" in flags
+    if len(args) > 1 or set(flags) - {"--compact", "--bidirectional"}:
+        sys.exit("Usage: python degrees.py [--compact] [--bidirectional] "
+                 "[directory]")
+    directory = args[0] if len(args) == 1 else "large"
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    stats = {}
+    load_data(directory, compact=compact, stats=stats)
     print("Data loaded.")
+    if stats["bad_rows"]:
+        print(f"Skipped {stats['bad_rows']} bad rows.")
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -74,7 +148,7 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    path = shortest_path(source, target, bidirectional=bidirectional)
 
     if path is None:
         print("Not connected.")
@@ -91,20 +165,21 @@ def main():
 def reverse_path(node):
     """
     Returns the solution of the shortest_path given the target node
-    by traversing up the parent nodes and inserting them into a list
-    until it reaches a "NoneType" parent.
+    by traversing up the parent nodes and collecting them into a list
+    until it reaches the source node, whose parent is None.
     """
     path_lst = []
     
     # Loop that adds each node to the list with each element as this
-    # format: (movie_id, person_id)
-    while node is not None:
-        path_lst = [(node.action, node.state)] + path_lst
+    # format: (movie_id, person_id), stopping at the source node
+    while node.parent is not None:
+        path_lst.append((node.action, node.state))
         node = node.parent
     
+    path_lst.reverse()
     return path_lst
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=False, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
@@ -115,52 +190,148 @@ def shortest_path(source, target):
     breadth first search (Graph) where the source and target
     are person_ids that represent "nodes" and the movies
     are represented as the path.
+
+    If `bidirectional` is true, searches from both ends at once
+    (see `bidirectional_path`). If a `stats` dict is given, the number
+    of people whose neighbors were expanded is stored in
+    stats["expanded"].
     """
-    
+    if bidirectional:
+        return bidirectional_path(source, target, stats)
+
+    if stats is not None:
+        stats["expanded"] = 0
+
     # If source is target, there are 0 degrees of separation
     if source == target:
         return []
 
     queue = QueueFrontier()     # Queue is used to keep neighboring nodes
-    visited_people = []         # Keeps visited person_id's/"nodes"
-    parent_node = None          # First node is None, Dummy node
-
-    # Loop that looks at nieghboring nodes, of each visited node until
-    # it finds 
-    while True:
-
-        # add neighbors to queue as node structures IF not visited before 
-        for (movie_id, person_id) in neighbors_for_person(source):
-            if person_id not in visited_people:
-                queue.add(Node(person_id, parent_node, movie_id))
-
-        # Solution does not exist if queue is empty so exit the loop
-        if queue.empty():
-            break
-        
-        # pop node from queue
+    visited_people = {source}   # Keeps visited person_id's/"nodes"
+    queue.add(Node(source, None, None))
+
+    # Loop that looks at neighboring nodes of each visited node until
+    # it finds the target
+    while not queue.empty():
+
+        # pop node from queue and expand it
         node = queue.remove()
+        if stats is not None:
+            stats["expanded"] += 1
+
+        # add neighbors to queue as node structures IF not visited before,
+        # checking for the target as soon as it is reached
+        for (movie_id, person_id) in neighbors_for_person(node.state):
+            if person_id in visited_people:
+                continue
+            child = Node(person_id, node, movie_id)
+            if person_id == target:
+                return reverse_path(child)
+            visited_people.add(person_id)
+            queue.add(child)
+
+    # No possible path
+    return None
+
+def bidirectional_path(source, target, stats=None):
+    """
+    Returns the same result as `shortest_path`, found with a
+    bidirectional breadth first search.
+
+    Frontiers grow from both source and target, one whole level at a
+    time, always expanding the smaller side. Once a level makes the two
+    sides meet, the shortest of the paths through that level is joined
+    and returned.
+    """
+    if stats is not None:
+        stats["expanded"] = 0
+
+    if source == target:
+        return []
+
+    # For each side, maps a reached person_id to (movie_id, person_id)
+    # of the person one step closer to that side's start, and the
+    # person's distance from that start
+    parents = ({source: None}, {target: None})
+    depths = ({source: 0}, {target: 0})
+    frontiers = ([source], [target])
+
+    while frontiers[0] and frontiers[1]:
+
+        # Expand the smaller frontier
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        parent, depth = parents[side], depths[side]
+        other_depth = depths[1 - side]
+
+        best = None
+        next_frontier = []
+        for person_id in frontiers[side]:
+            if stats is not None:
+                stats["expanded"] += 1
+            for (movie_id, neighbor_id) in neighbors_for_person(person_id):
+                if neighbor_id in parent:
+                    continue
+                parent[neighbor_id] = (movie_id, person_id)
+                depth[neighbor_id] = depth[person_id] + 1
+                next_frontier.append(neighbor_id)
+
+                # Frontiers met: remember the shortest joined path
+                if neighbor_id in other_depth:
+                    length = depth[neighbor_id] + other_depth[neighbor_id]
+                    if best is None or length < best[0]:
+                        best = (length, neighbor_id)
+
+        if best is not None:
+            return join_paths(parents, best[1])
+        frontiers = ((next_frontier, frontiers[1]) if side == 0
+                     else (frontiers[0], next_frontier))
 
-        if node.state == target:
-            # Solution found so exit loop and return solution
-            return reverse_path(node)
-        else:
-            # Solution not found yet, so set node as parent_node then
-            # add the node to visited nodes and search next neighbors
-            parent_node = node
-            source = node.state
-            visited_people.append(node.state)
-    
     # No possible path
     return None
 
+def join_paths(parents, meeting):
+    """
+    Builds the (movie_id, person_id) path of a bidirectional search
+    whose two sides met at person_id `meeting`.
+    """
+    forward, backward = parents
+
+    # Walk from the meeting point back to the source
+    path_lst = []
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, previous = forward[person_id]
+        path_lst.append((movie_id, person_id))
+        person_id = previous
+    path_lst.reverse()
+
+    # Walk from the meeting point on to the target
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, person_id = backward[person_id]
+        path_lst.append((movie_id, person_id))
+
+    return path_lst
+
+def person_ids_for_name(name):
+    """
+    Returns a sorted list of the IMDB ids of everyone named `name`.
+    """
+    return sorted(names.get(name.lower(), set()))
+
+
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = person_ids_for_name(name)
     if len(person_ids) == 0:
+        suggestions = suggest_names(name)
+        if suggestions:
+            print(f"No one named '{name}'. Did you mean:")
+            for suggestion in suggestions:
+                print(f"    {suggestion}")
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
@@ -180,11 +351,97 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
-def neighbors_for_person(person_id):
+def name_lookup():
     """
-    Returns (movie_id, person_id) pairs for people
-    who starred with a given person.
+    Returns the NameIndex of all names. It is mapped from the snapshot
+    when there is one, otherwise built the first time it is needed.
+    """
+    global names_lookup
+    if names_lookup is None:
+        keys = graph.name_index if graph is not None else names
+        names_lookup = NameIndex.build(sorted(keys))
+        if graph is not None:
+            graph.name_lookup = names_lookup
+    return names_lookup
+
+
+def suggest_names(name, limit=5):
+    """
+    Returns up to `limit` names closest to a misspelled `name`, best
+    first, spelled as in the data.
+    """
+    return [display_name(key) for key in name_lookup().suggest(name, limit)]
+
+
+def complete_name(prefix, limit=10):
+    """
+    Returns up to `limit` names starting with `prefix`, in order,
+    spelled as in the data.
+    """
+    return [display_name(key)
+            for key in name_lookup().complete(prefix, limit)]
+
+
+def display_name(key):
+    """
+    Returns the name as spelled in the data for a lowercase name.
+    """
+    return people[min(names[key])]["name"]
+
+
+def cache_neighbors(size, precompute=0):
+    """
+    Caches the neighbors of up to `size` recently expanded people.
+
+    The neighbors of the `precompute` people with the most co-star
+    links are computed right away and never evicted, since searches
+    keep running into those hubs.
+    """
+    global neighbor_cache
+    neighbor_cache = LRUCache(size)
+    if precompute <= 0:
+        return
+
+    if graph is not None:
+        cast_sizes = [graph.movie_offsets[m + 1] - graph.movie_offsets[m]
+                      for m in range(len(graph.movie_ids))]
+        links = (
+            (sum(cast_sizes[m] for m in graph.movies_of(p)), p)
+            for p in range(len(graph.person_ids))
+        )
+        hubs = [graph.person_ids[p]
+                for _, p in heapq.nlargest(precompute, links)]
+    else:
+        hubs = heapq.nlargest(precompute, people, key=lambda person_id: sum(
+            len(movies[movie_id]["stars"])
+            for movie_id in people[person_id]["movies"]
+        ))
+
+    for person_id in hubs:
+        neighbor_cache.pin(person_id, unique_neighbors(person_id))
+
+
+def unique_neighbors(person_id):
+    """
+    Returns a tuple of (movie_id, person_id) pairs with one pair, and
+    so one witnessing movie, for each co-star of a given person.
+    """
+    costars = {}
+    for movie_id, costar_id in all_neighbors(person_id):
+        if costar_id != person_id:
+            costars.setdefault(costar_id, movie_id)
+    return tuple((movie_id, costar_id)
+                 for costar_id, movie_id in costars.items())
+
+
+def all_neighbors(person_id):
+    """
+    Returns the set of every (movie_id, person_id) pair for people
+    who starred with a given person, including the person.
     """
+    if graph is not None:
+        return graph.neighbors(person_id)
+
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -193,5 +450,23 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+def neighbors_for_person(person_id):
+    """
+    Returns (movie_id, person_id) pairs for people
+    who starred with a given person.
+
+    When neighbors are cached (see `cache_neighbors`), returns the
+    cached `unique_neighbors` instead.
+    """
+    if neighbor_cache is None:
+        return all_neighbors(person_id)
+
+    neighbors = neighbor_cache.get(person_id)
+    if neighbors is None:
+        neighbors = unique_neighbors(person_id)
+        neighbor_cache.put(person_id, neighbors)
+    return neighbors
+
+
 if __name__ == "__main__":
     main()
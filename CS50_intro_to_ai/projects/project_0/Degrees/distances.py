@@ -0,0 +1,164 @@
+"""
+Distances from one person to everyone, and the distribution of
+degrees of separation over sampled pairs of people.
+
+Works on the compact graph, so data must be loaded with
+degrees.load_data(directory, compact=True).
+"""
+import random
+import sys
+from array import array
+from collections import Counter
+from multiprocessing import Pool
+
+import degrees
+
+
+def single_source(person_id):
+    """
+    Runs one breadth first search from `person_id` and returns
+    (distances, parents, parent_movies), arrays indexed by person
+    index (see CompactGraph):
+        - distances[i] is the degrees of separation of person i,
+          or -1 if person i can't be reached
+        - parents[i] is the index of the person one step closer to
+          the source, and parent_movies[i] the index of the movie
+          they starred in together (-1 for unreachable people; the
+          source is its own parent)
+    """
+    graph = degrees.graph
+    if graph is None:
+        raise Exception("load the data with compact=True first")
+    source = graph.person_index[person_id]
+
+    size = len(graph.person_ids)
+    distances = array("i", [-1]) * size
+    parents = array("i", [-1]) * size
+    parent_movies = array("i", [-1]) * size
+
+    # Each movie only needs to be expanded once: all of its stars are
+    # reached from whoever reaches the movie first
+    movie_seen = bytearray(len(graph.movie_ids))
+
+    distances[source] = 0
+    parents[source] = source
+    frontier = [source]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for person in frontier:
+            for movie in graph.movies_of(person):
+                if movie_seen[movie]:
+                    continue
+                movie_seen[movie] = 1
+                for costar in graph.stars_of(movie):
+                    if distances[costar] < 0:
+                        distances[costar] = depth
+                        parents[costar] = person
+                        parent_movies[costar] = movie
+                        next_frontier.append(costar)
+        frontier = next_frontier
+
+    return distances, parents, parent_movies
+
+
+def path_to(target_id, parents, parent_movies):
+    """
+    Returns the (movie_id, person_id) path from the source of a
+    `single_source` search to `target_id`, or None if not reachable.
+    """
+    graph = degrees.graph
+    person = graph.person_index[target_id]
+    if parents[person] < 0:
+        return None
+    path = []
+    while parents[person] != person:
+        path.append((graph.movie_ids[parent_movies[person]],
+                     graph.person_ids[person]))
+        person = parents[person]
+    path.reverse()
+    return path
+
+
+def histogram(distances):
+    """
+    Returns a Counter of degrees of separation in `distances`,
+    with unreachable people counted under None.
+    """
+    counts = Counter(distances)
+    counts[None] = counts.pop(-1, 0)
+    counts.pop(0, None)
+    return counts
+
+
+def load_worker(directory):
+    """
+    Pool initializer: loads (or maps) the graph in each worker.
+    """
+    degrees.load_data(directory, compact=True)
+
+
+def source_histogram(source):
+    """
+    Returns the histogram of distances from person index `source`.
+    """
+    person_id = degrees.graph.person_ids[source]
+    return histogram(single_source(person_id)[0])
+
+
+def sampled_histogram(directory, samples=100, processes=None, seed=0):
+    """
+    Returns the histogram of degrees of separation from `samples`
+    random sources to everyone, searching from the sources in parallel.
+    """
+    degrees.load_data(directory, compact=True)
+    people = len(degrees.graph.person_ids)
+    sources = random.Random(seed).sample(range(people),
+                                         min(samples, people))
+
+    total = Counter()
+    with Pool(processes, initializer=load_worker,
+              initargs=(directory,)) as pool:
+        for counts in pool.imap_unordered(source_histogram, sources):
+            total.update(counts)
+    return total
+
+
+def print_histogram(counts):
+    """
+    Prints a histogram returned by `histogram` or `sampled_histogram`.
+    """
+    reachable = sorted(d for d in counts if d is not None)
+    pairs = sum(counts.values())
+    for d in reachable:
+        print(f"{d:>3}: {counts[d]:>12} ({100 * counts[d] / pairs:.2f}%)")
+    print(f"not connected: {counts[None]:>12} "
+          f"({100 * counts[None] / max(pairs, 1):.2f}%)")
+
+
+def main():
+    usage = ("Usage: python distances.py from [directory]\n"
+             "       python distances.py sample [directory] [samples] "
+             "[processes]")
+    if len(sys.argv) < 2:
+        sys.exit(usage)
+    command, args = sys.argv[1], sys.argv[2:]
+    directory = args[0] if args else "large"
+
+    if command == "from" and len(args) <= 1:
+        degrees.load_data(directory, compact=True)
+        source = degrees.person_id_for_name(input("Name: "))
+        if source is None:
+            sys.exit("Person not found.")
+        print_histogram(histogram(single_source(source)[0]))
+    elif command == "sample" and len(args) <= 3:
+        samples = int(args[1]) if len(args) >= 2 else 100
+        processes = int(args[2]) if len(args) == 3 else None
+        print_histogram(sampled_histogram(directory, samples, processes))
+    else:
+        sys.exit(usage)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,487 @@
+import sys
+import time
+from array import array
+from operator import itemgetter
+
+import ingest
+
+
+class CompactGraph():
+    """
+    Person-movie bipartite graph stored as CSR (compressed sparse row)
+    arrays instead of nested dicts of sets.
+
+    IMDB ids are interned to dense integers: person `i` has IMDB id
+    `person_ids[i]`, and the movies it starred in are
+        person_movies[person_offsets[i]:person_offsets[i + 1]]
+    Movies are stored the same way, pointing back at people.
+
+    A graph loaded from a snapshot (see snapshot.py) has the same
+    attributes, but its lists and dicts are replaced by string tables
+    and sorted indices over the memory-mapped file.
+    """
+
+    def __init__(self):
+
+        # Dense index -> IMDB id, and the reverse lookup
+        self.person_ids = []
+        self.person_index = {}
+        self.movie_ids = []
+        self.movie_index = {}
+
+        # Per-person and per-movie attributes, indexed like the ids
+        self.person_names = []
+        self.person_births = []
+        self.movie_titles = []
+        self.movie_years = []
+
+        # Maps lowercase names to a list of person indices
+        self.name_index = {}
+
+        # Prefix and trigram lookup of the names (lookup.NameIndex),
+        # if built or mapped from a snapshot
+        self.name_lookup = None
+
+        # CSR adjacency in both directions
+        self.person_offsets = array("i", [0])
+        self.person_movies = array("i")
+        self.movie_offsets = array("i", [0])
+        self.movie_people = array("i")
+
+        # Memory-mapped snapshot file the graph was loaded from, if any
+        self.snapshot = None
+
+        # Dict-compatible views so the rest of degrees.py keeps working
+        self.names = NamesView(self)
+        self.people = PeopleView(self)
+        self.movies = MoviesView(self)
+
+    @classmethod
+    def from_csv(cls, directory, processes=1, stats=None):
+        """
+        Builds a graph from the people, movies and stars CSV files
+        in `directory`, parsing them on `processes` processes.
+
+        If a `stats` dict is given, stores the number of rows read,
+        the number of bad rows skipped (malformed, or starring an
+        unknown person or movie) and the seconds taken.
+        """
+        start = time.perf_counter()
+        tables = ingest.read_tables(directory, processes)
+        people, movies, stars = (tables[name] for name in ingest.TABLES)
+        graph = cls()
+        graph.person_ids, graph.person_index = people.ids, people.index
+        graph.person_names, graph.person_births = people.columns
+        graph.name_index = people.names
+        graph.movie_ids, graph.movie_index = movies.ids, movies.index
+        graph.movie_titles, graph.movie_years = movies.columns
+        graph.add_edges(stars.people, stars.movies)
+
+        if stats is not None:
+            stats["rows"] = sum(table.rows for table in tables.values())
+            stats["bad_rows"] = sum(
+                table.bad_rows for table in tables.values())
+            stats["seconds"] = time.perf_counter() - start
+        return graph
+
+    def add_person(self, person_id, name, birth):
+        """
+        Interns a person and returns its dense index.
+        """
+        index = self.person_index.get(person_id)
+        if index is not None:
+            return index
+        index = len(self.person_ids)
+        self.person_index[person_id] = index
+        self.person_ids.append(person_id)
+        self.person_names.append(name)
+        self.person_births.append(birth)
+        self.name_index.setdefault(name.lower(), []).append(index)
+        return index
+
+    def add_movie(self, movie_id, title, year):
+        """
+        Interns a movie and returns its dense index.
+        """
+        index = self.movie_index.get(movie_id)
+        if index is not None:
+            return index
+        index = len(self.movie_ids)
+        self.movie_index[movie_id] = index
+        self.movie_ids.append(movie_id)
+        self.movie_titles.append(title)
+        self.movie_years.append(year)
+        return index
+
+    def add_stars(self, pairs):
+        """
+        Builds the CSR adjacency from (person_id, movie_id) pairs.
+        Pairs naming an unknown person or movie are skipped, and
+        their number is returned.
+
+        Must be called once, after every person and movie was added.
+        """
+        pairs = list(pairs)
+        edges = [
+            edge for edge in zip(
+                map(self.person_index.get, map(itemgetter(0), pairs)),
+                map(self.movie_index.get, map(itemgetter(1), pairs))
+            )
+            if None not in edge
+        ]
+        self.add_edges(array("i", map(itemgetter(0), edges)),
+                       array("i", map(itemgetter(1), edges)))
+        return len(pairs) - len(edges)
+
+    def add_edges(self, edge_people, edge_movies):
+        """
+        Builds the CSR adjacency from arrays of the person and movie
+        index of each edge.
+
+        Must be called once, after every person and movie was added.
+        """
+        self.person_offsets, self.person_movies = csr(
+            edge_people, edge_movies, len(self.person_ids))
+        self.movie_offsets, self.movie_people = csr(
+            edge_movies, edge_people, len(self.movie_ids))
+
+    def movies_of(self, person):
+        """
+        Returns the movie indices of person index `person`.
+        """
+        return self.person_movies[
+            self.person_offsets[person]:self.person_offsets[person + 1]]
+
+    def stars_of(self, movie):
+        """
+        Returns the person indices of movie index `movie`.
+        """
+        return self.movie_people[
+            self.movie_offsets[movie]:self.movie_offsets[movie + 1]]
+
+    def neighbors(self, person_id):
+        """
+        Returns (movie_id, person_id) pairs for people
+        who starred with a given person.
+        """
+        neighbors = set()
+        for movie in self.movies_of(self.person_index[person_id]):
+            movie_id = self.movie_ids[movie]
+            for person in self.stars_of(movie):
+                neighbors.add((movie_id, self.person_ids[person]))
+        return neighbors
+
+    def edge_count(self):
+        """
+        Returns the number of person-movie edges in the graph.
+        """
+        return len(self.person_movies)
+
+    def memory_usage(self):
+        """
+        Returns a dict of approximate bytes used by each part
+        of the graph.
+        """
+        return {
+            "ids": (deep_sizeof(self.person_ids)
+                    + deep_sizeof(self.movie_ids)
+                    + deep_sizeof(self.person_index)
+                    + deep_sizeof(self.movie_index)),
+            "attributes": (deep_sizeof(self.person_names)
+                           + deep_sizeof(self.person_births)
+                           + deep_sizeof(self.movie_titles)
+                           + deep_sizeof(self.movie_years)),
+            "names": deep_sizeof(self.name_index),
+            "adjacency": sum(nbytes(a) for a in (
+                self.person_offsets, self.person_movies,
+                self.movie_offsets, self.movie_people
+            ))
+        }
+
+
+class StringTable():
+    """
+    Immutable sequence of strings stored as one UTF-8 buffer plus an
+    array of offsets, so it can be written to and mapped from a file.
+    """
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    @classmethod
+    def build(cls, strings):
+        offsets = array("q", [0])
+        blob = bytearray()
+        for string in strings:
+            blob += string.encode("utf-8")
+            offsets.append(len(blob))
+        return cls(offsets, bytes(blob))
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __sizeof__(self):
+        return (object.__sizeof__(self)
+                + nbytes(self.offsets) + nbytes(self.blob))
+
+
+class SortedIndex():
+    """
+    Maps the strings of `keys` back to their position, by binary
+    search over `order`, the positions of `keys` in sorted key order.
+    Used in place of a dict when the keys come from a snapshot.
+    """
+
+    def __init__(self, keys, order):
+        self.keys = keys
+        self.order = order
+
+    @classmethod
+    def build(cls, keys):
+        return cls(keys, array("i", sorted(range(len(keys)),
+                                           key=keys.__getitem__)))
+
+    def get(self, key, default=None):
+        keys, order = self.keys, self.order
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if keys[order[mid]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(order) and keys[order[lo]] == key:
+            return order[lo]
+        return default
+
+    def __getitem__(self, key):
+        i = self.get(key)
+        if i is None:
+            raise KeyError(key)
+        return i
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self.order)
+
+    def __sizeof__(self):
+        return object.__sizeof__(self) + nbytes(self.order)
+
+
+class SortedMultiIndex():
+    """
+    Maps each string of the sorted table `keys` to a slice of `values`,
+    given as CSR `offsets`. Used in place of the dict of lists that
+    maps lowercase names to person indices.
+    """
+
+    def __init__(self, keys, offsets, values):
+        self.keys = keys
+        self.offsets = offsets
+        self.values = values
+
+    @classmethod
+    def build(cls, mapping):
+        keys = sorted(mapping)
+        offsets = array("i", [0])
+        values = array("i")
+        for key in keys:
+            values.extend(mapping[key])
+            offsets.append(len(values))
+        return cls(StringTable.build(keys), offsets, values)
+
+    def position(self, key):
+        """
+        Returns the position of the first key not less than `key`.
+        """
+        keys = self.keys
+        lo, hi = 0, len(keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if keys[mid] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def get(self, key, default=None):
+        i = self.position(key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.values[self.offsets[i]:self.offsets[i + 1]]
+        return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __sizeof__(self):
+        return (object.__sizeof__(self) + sys.getsizeof(self.keys)
+                + nbytes(self.offsets) + nbytes(self.values))
+
+
+class NamesView():
+    """
+    Read-only stand-in for the `names` dict of degrees.py.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def get(self, name, default=None):
+        indices = self.graph.name_index.get(name)
+        if indices is None:
+            return default
+        return {self.graph.person_ids[i] for i in indices}
+
+    def __getitem__(self, name):
+        person_ids = self.get(name)
+        if person_ids is None:
+            raise KeyError(name)
+        return person_ids
+
+    def __contains__(self, name):
+        return name in self.graph.name_index
+
+    def __len__(self):
+        return len(self.graph.name_index)
+
+
+class PeopleView():
+    """
+    Read-only stand-in for the `people` dict of degrees.py.
+    Records are built on access.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        i = graph.person_index[person_id]
+        return {
+            "name": graph.person_names[i],
+            "birth": graph.person_births[i],
+            "movies": {graph.movie_ids[m] for m in graph.movies_of(i)}
+        }
+
+    def __contains__(self, person_id):
+        return person_id in self.graph.person_index
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+
+class MoviesView():
+    """
+    Read-only stand-in for the `movies` dict of degrees.py.
+    Records are built on access.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        i = graph.movie_index[movie_id]
+        return {
+            "title": graph.movie_titles[i],
+            "year": graph.movie_years[i],
+            "stars": {graph.person_ids[p] for p in graph.stars_of(i)}
+        }
+
+    def __contains__(self, movie_id):
+        return movie_id in self.graph.movie_index
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+
+def csr(sources, targets, size):
+    """
+    Groups the `targets` of each edge by its source, returning
+    (offsets, indices) arrays for `size` source nodes.
+    """
+    offsets = array("i", [0]) * (size + 1)
+    for source in sources:
+        offsets[source + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    indices = array("i", [0]) * len(targets)
+    fill = array("i", offsets[:-1])
+    for source, target in zip(sources, targets):
+        indices[fill[source]] = target
+        fill[source] += 1
+    return offsets, indices
+
+
+def nbytes(buffer):
+    """
+    Returns the size in bytes of the data in an array, bytes object
+    or memoryview.
+    """
+    return memoryview(buffer).nbytes
+
+
+def deep_sizeof(obj, seen=None):
+    """
+    Returns the approximate number of bytes used by `obj` and
+    everything it refers to, counting shared objects once.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_sizeof(key, seen) + deep_sizeof(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deep_sizeof(item, seen)
+    return size
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python graph.py [directory]")
+    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+
+    import degrees
+
+    # Dict backend
+    degrees.load_data(directory)
+    edges = sum(len(person["movies"]) for person in degrees.people.values())
+    dict_bytes = deep_sizeof([degrees.names, degrees.people, degrees.movies])
+
+    # Compact backend
+    graph = CompactGraph.from_csv(directory)
+    usage = graph.memory_usage()
+    compact_bytes = sum(usage.values())
+
+    print(f"Edges: {edges}")
+    print(f"dict backend:    {dict_bytes:>12} bytes, "
+          f"{dict_bytes / max(edges, 1):.1f} bytes/edge")
+    print(f"compact backend: {compact_bytes:>12} bytes, "
+          f"{compact_bytes / max(graph.edge_count(), 1):.1f} bytes/edge")
+    for part, size in usage.items():
+        print(f"    {part}: {size} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Chunked, optionally parallel parsing of the Degrees CSV files.
+
+Each file is split into byte ranges that end on line boundaries, and
+each range is parsed and indexed on its own (by worker processes when
+asked to). A chunk of people or movies becomes a partial Table of its
+ids and columns, with a partial index of names for people; the partial
+Tables are merged in file order. The stars are read once people and
+movies are known, and each chunk of them becomes arrays of the dense
+person and movie indices it connects, which are concatenated.
+
+Rows with missing fields, and stars naming an unknown person or movie,
+are counted instead of raising. Chunks are split on newlines, so a
+quoted field containing a newline can only be read correctly when it
+doesn't straddle a chunk boundary; the IMDB exports don't have any.
+"""
+import csv
+import io
+import os
+from array import array
+from multiprocessing import Pool
+from operator import itemgetter
+
+# Columns read from each file, in order
+TABLES = {
+    "people.csv": ("id", "name", "birth"),
+    "movies.csv": ("id", "title", "year"),
+    "stars.csv": ("person_id", "movie_id")
+}
+
+# Number of leading columns of TABLES that must not be empty
+# for a row to be used
+REQUIRED = {
+    "people.csv": 2,
+    "movies.csv": 1,
+    "stars.csv": 2
+}
+
+CHUNK_SIZE = 1 << 20
+
+# (person index, movie index) the stars are mapped through while they
+# are read, in the process reading them
+indexes = None
+
+
+class Table():
+    """
+    Parsed contents of the people or movies file, or of a chunk of it:
+    `ids` holds the id of each row, in file order and without repeats,
+    `index` maps each id to its position (once merged), `columns`
+    holds a list of the values of each other TABLES column, and `names`
+    maps each lowercase name to the positions of the people with it
+    (people only).
+    `rows` counts every row and `bad_rows` the rows skipped.
+    """
+
+    def __init__(self, width, named=False):
+        self.ids = []
+        self.index = {}
+        self.columns = tuple([] for _ in range(width))
+        self.named = named
+        self.names = {}
+        self.rows = 0
+        self.bad_rows = 0
+
+    def merge(self, part):
+        """
+        Appends the rows of `part`, the Table of the next chunk. Rows
+        whose id is already in the table are skipped, keeping the first.
+        """
+        self.rows += part.rows
+        self.bad_rows += part.bad_rows
+        if not self.index.keys().isdisjoint(part.ids):
+            part = part.without(self.index)
+
+        offset = len(self.ids)
+        self.ids.extend(part.ids)
+        self.index.update(zip(part.ids, range(offset, len(self.ids))))
+        for column, values in zip(self.columns, part.columns):
+            column.extend(values)
+        for name, positions in part.names.items():
+            shifted = [offset + position for position in positions]
+            known = self.names.get(name)
+            if known is None:
+                self.names[name] = shifted
+            else:
+                known.extend(shifted)
+
+    def without(self, ids):
+        """
+        Returns a copy of the table without the rows whose id is in `ids`.
+        """
+        kept = [position for position, id in enumerate(self.ids)
+                if id not in ids]
+        table = Table(len(self.columns), self.named)
+        table.ids = [self.ids[position] for position in kept]
+        table.columns = tuple([column[position] for position in kept]
+                              for column in self.columns)
+        moved = {position: i for i, position in enumerate(kept)}
+        for name, positions in self.names.items():
+            positions = [moved[position] for position in positions
+                         if position in moved]
+            if positions:
+                table.names[name] = positions
+        return table
+
+
+class Edges():
+    """
+    Parsed contents of the stars file, or of a chunk of it: `people`
+    and `movies` hold the person and movie index of each star, as in
+    the people and movies Tables. `rows` counts every row and
+    `bad_rows` the rows skipped, including stars naming an unknown
+    person or movie.
+    """
+
+    def __init__(self):
+        self.people = array("i")
+        self.movies = array("i")
+        self.rows = 0
+        self.bad_rows = 0
+
+    def merge(self, part):
+        """
+        Appends the stars of `part`, the Edges of the next chunk.
+        """
+        self.people.extend(part.people)
+        self.movies.extend(part.movies)
+        self.rows += part.rows
+        self.bad_rows += part.bad_rows
+
+
+def read_tables(directory, processes=1):
+    """
+    Returns a dict mapping each file name in TABLES to its Table (or
+    Edges, for the stars), parsing chunks on `processes` worker
+    processes if more than one.
+    """
+    tables = {
+        "people.csv": Table(2, named=True),
+        "movies.csv": Table(2)
+    }
+    names = []
+    tasks = []
+    for name, table in tables.items():
+        for chunk in chunks(directory, name, processes):
+            names.append(name)
+            tasks.append((read_table,) + chunk + (table.named,))
+    for name, part in zip(names, run(tasks, processes)):
+        tables[name].merge(part)
+
+    # The stars are mapped to the indexes of the merged tables
+    stars = tables["stars.csv"] = Edges()
+    tasks = [(read_edges,) + chunk
+             for chunk in chunks(directory, "stars.csv", processes)]
+    known = (tables["people.csv"].index, tables["movies.csv"].index)
+    for part in run(tasks, processes, known):
+        stars.merge(part)
+    return tables
+
+
+def chunks(directory, name, processes):
+    """
+    Returns the (path, start, end, positions, required) arguments of
+    `parse_chunk` for each chunk of the file `name` in `directory`,
+    splitting it in at least `processes` chunks.
+    """
+    path = os.path.join(directory, name)
+    positions, body_start = header_positions(path, name)
+    size = os.path.getsize(path)
+    count = max(processes, size // CHUNK_SIZE, 1)
+    return [(path, start, end, positions, REQUIRED[name])
+            for start, end in chunk_ranges(path, body_start, size, count)]
+
+
+def run(tasks, processes, known=None):
+    """
+    Yields the result of each (function, *args) task, in order, computed
+    in this process or on a pool of `processes` processes, with `known`
+    as the indexes the stars are mapped through.
+
+    Results are yielded as they come, so only the chunks not merged yet
+    are held at once.
+    """
+    if processes <= 1:
+        set_indexes(known)
+        try:
+            yield from map(call_task, tasks)
+        finally:
+            set_indexes(None)
+    else:
+        with Pool(processes, set_indexes, (known,)) as pool:
+            yield from pool.imap(call_task, tasks)
+
+
+def call_task(call):
+    """
+    Calls a (function, *args) task, for the pool.
+    """
+    return call[0](*call[1:])
+
+
+def set_indexes(known):
+    """
+    Sets the indexes the stars are mapped through, in the process
+    reading them.
+    """
+    global indexes
+    indexes = known
+
+
+def header_positions(path, name):
+    """
+    Reads the header of a CSV file and returns the position of each
+    column of TABLES[name] in a row, and the byte offset where the
+    rows start.
+    """
+    with open(path, "rb") as f:
+        header = f.readline()
+    columns = next(csv.reader([header.decode("utf-8-sig")]))
+    try:
+        positions = [columns.index(field) for field in TABLES[name]]
+    except ValueError:
+        raise Exception(f"{path} must have columns {TABLES[name]}")
+    return positions, len(header)
+
+
+def chunk_ranges(path, start, end, chunks):
+    """
+    Splits the bytes from `start` to `end` of a file into about
+    `chunks` ranges, each ending just after a newline.
+    """
+    bounds = [start]
+    with open(path, "rb") as f:
+        for i in range(1, chunks):
+            f.seek(start + (end - start) * i // chunks)
+            f.readline()
+            position = min(f.tell(), end)
+            if position > bounds[-1]:
+                bounds.append(position)
+    if end > bounds[-1]:
+        bounds.append(end)
+    return list(zip(bounds, bounds[1:]))
+
+
+def parse_chunk(path, start, end, positions, required):
+    """
+    Parses the rows between byte offsets `start` and `end` of a CSV
+    file, returning (records, rows, bad_rows), where records holds
+    the values at `positions` of each row whose first `required`
+    values are not empty.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+
+    pick = itemgetter(*positions)
+    width = max(positions) + 1
+    records = []
+    rows = 0
+    for row in csv.reader(io.StringIO(text, newline="")):
+        if not row:
+            continue
+        rows += 1
+        if len(row) >= width:
+            record = pick(row)
+            if "" not in record[:required]:
+                records.append(record)
+    return records, rows, rows - len(records)
+
+
+def read_table(path, start, end, positions, required, named):
+    """
+    Parses a chunk of the people or movies file into a Table, indexing
+    the names of its people if `named`.
+    """
+    records, rows, bad_rows = parse_chunk(path, start, end, positions,
+                                          required)
+    table = Table(len(positions) - 1, named)
+    table.rows, table.bad_rows = rows, bad_rows
+    if not records:
+        return table
+
+    ids, *columns = zip(*records)
+    table.ids = list(ids)
+    table.columns = tuple(map(list, columns))
+    if len(set(ids)) < len(ids):
+        # Keep the first row of each id repeated within the chunk
+        first = {}
+        for position, id in enumerate(ids):
+            first.setdefault(id, position)
+        kept = sorted(first.values())
+        table.ids = [ids[position] for position in kept]
+        table.columns = tuple([column[position] for position in kept]
+                              for column in columns)
+
+    if named:
+        for position, name in enumerate(map(str.lower, table.columns[0])):
+            positions = table.names.get(name)
+            if positions is None:
+                table.names[name] = [position]
+            else:
+                positions.append(position)
+    return table
+
+
+def read_edges(path, start, end, positions, required):
+    """
+    Parses a chunk of the stars file into Edges, through the person and
+    movie indexes set by `set_indexes`.
+    """
+    records, rows, bad_rows = parse_chunk(path, start, end, positions,
+                                          required)
+    person_index, movie_index = indexes
+    people = list(map(person_index.get, map(itemgetter(0), records)))
+    movies = list(map(movie_index.get, map(itemgetter(1), records)))
+    if None in people or None in movies:
+        known = [edge for edge in zip(people, movies) if None not in edge]
+        people = map(itemgetter(0), known)
+        movies = map(itemgetter(1), known)
+        bad_rows += len(records) - len(known)
+
+    edges = Edges()
+    edges.people = array("i", people)
+    edges.movies = array("i", movies)
+    edges.rows = rows
+    edges.bad_rows = bad_rows
+    return edges
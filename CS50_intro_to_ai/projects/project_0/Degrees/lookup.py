@@ -0,0 +1,131 @@
+"""
+Prefix and fuzzy lookup over the lowercase names of the Degrees data.
+
+Names are kept sorted, so the names starting with a prefix are one
+binary search away. For misspelled names, every name is indexed by its
+character trigrams: candidates are gathered from the postings of the
+query's rarest trigrams, then ranked by trigram similarity.
+"""
+from array import array
+from collections import Counter
+
+from graph import StringTable
+
+# Postings scanned for candidates, and candidates ranked, per query.
+# Only names made of very common trigrams reach these limits.
+CANDIDATE_POSTINGS = 5000
+RANKED_CANDIDATES = 50
+
+# Least trigram similarity (Dice coefficient) of a suggestion
+MIN_SIMILARITY = 0.3
+
+
+class NameIndex():
+    """
+    `keys` is the sorted sequence of distinct lowercase names.
+    Trigram `grams[i]` occurs in the names at positions
+        postings[offsets[i]:offsets[i + 1]]
+    of `keys`, with `grams` sorted too.
+    """
+
+    def __init__(self, keys, grams, offsets, postings):
+        self.keys = keys
+        self.grams = grams
+        self.offsets = offsets
+        self.postings = postings
+
+    @classmethod
+    def build(cls, keys):
+        """
+        Indexes `keys`, a sorted list of distinct lowercase names.
+        """
+        index = {}
+        for i, key in enumerate(keys):
+            for gram in trigrams(key):
+                postings = index.get(gram)
+                if postings is None:
+                    index[gram] = postings = array("i")
+                postings.append(i)
+
+        grams = sorted(index)
+        offsets = array("i", [0])
+        postings = array("i")
+        for gram in grams:
+            postings.extend(index[gram])
+            offsets.append(len(postings))
+        return cls(keys, StringTable.build(grams), offsets, postings)
+
+    def postings_of(self, gram):
+        """
+        Returns the positions in `keys` of the names containing `gram`.
+        """
+        i = bisect(self.grams, gram)
+        if i < len(self.grams) and self.grams[i] == gram:
+            return self.postings[self.offsets[i]:self.offsets[i + 1]]
+        return self.postings[0:0]
+
+    def complete(self, prefix, limit=10):
+        """
+        Returns up to `limit` names starting with `prefix`, in order.
+        """
+        prefix = prefix.lower()
+        names = []
+        i = bisect(self.keys, prefix)
+        while (len(names) < limit and i < len(self.keys)
+               and self.keys[i].startswith(prefix)):
+            names.append(self.keys[i])
+            i += 1
+        return names
+
+    def suggest(self, name, limit=5):
+        """
+        Returns up to `limit` names most similar to `name`, best first,
+        leaving out names less similar than MIN_SIMILARITY.
+        """
+        query = trigrams(name.lower())
+
+        # Count trigram hits over the postings of the rarest trigrams,
+        # which single out the fewest, most telling candidates
+        postings = sorted((self.postings_of(gram) for gram in query), key=len)
+        hits = Counter()
+        gathered = 0
+        for i, matches in enumerate(postings):
+            if i and gathered + len(matches) > CANDIDATE_POSTINGS:
+                break
+            gathered += len(matches)
+            hits.update(matches)
+
+        # Rank the best candidates by their similarity to the query
+        scored = []
+        for match, _ in hits.most_common(RANKED_CANDIDATES):
+            key = self.keys[match]
+            grams = trigrams(key)
+            score = 2 * len(query & grams) / (len(query) + len(grams))
+            if score >= MIN_SIMILARITY:
+                scored.append((-score, len(key), key))
+        scored.sort()
+        return [key for _, _, key in scored[:limit]]
+
+
+def trigrams(name):
+    """
+    Returns the set of character trigrams of `name`, padded so that
+    the start and end of the name count too.
+    """
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bisect(keys, key):
+    """
+    Returns the position of the first of the sorted `keys` not less
+    than `key`. Works on any sequence, including a StringTable.
+    """
+    lo, hi = 0, len(keys)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if keys[mid] < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
@@ -0,0 +1,241 @@
+"""
+Every shortest path between two people, with every movie that
+witnesses each step, enumerated lazily.
+
+A bidirectional breadth first search records, for each person reached,
+all of the (movie, person) pairs one step closer to where that side
+started. The people on some shortest path and those pairs form a
+layered DAG between source and target, and paths are generated by
+walking it, so a pair of hubs with millions of equal-length paths can
+be streamed and capped instead of materialized.
+"""
+import sys
+from itertools import islice
+
+import degrees
+
+
+class PathDAG():
+    """
+    Shortest paths of `length` steps from `source` to `target`.
+
+    Every shortest path goes through exactly one of the `meetings`.
+    `forward` maps each person between the source and a meeting to the
+    sorted list of (movie_id, person_id) pairs one step closer to the
+    source (None for the source itself); `backward` does the same
+    towards the target.
+    """
+
+    def __init__(self, source, target, length, meetings, forward, backward):
+        self.source = source
+        self.target = target
+        self.length = length
+        self.meetings = meetings
+        self.forward = forward
+        self.backward = backward
+
+    def paths(self):
+        """
+        Yields every shortest path as a list of (movie_id, person_id)
+        pairs, like `degrees.shortest_path`, in a repeatable order.
+        """
+        for meeting in self.meetings:
+            for head in walk(meeting, self.forward):
+
+                # Turn the steps back to the source around
+                arrivals = [meeting] + [person_id for _, person_id in head]
+                head = [(movie_id, person_id) for (movie_id, _), person_id
+                        in zip(head, arrivals)]
+                head.reverse()
+                for tail in walk(meeting, self.backward):
+                    yield head + tail
+
+    def count(self):
+        """
+        Returns the number of shortest paths, without listing them.
+        """
+        to_source = count_walks(self.forward)
+        to_target = count_walks(self.backward)
+        return sum(to_source[meeting] * to_target[meeting]
+                   for meeting in self.meetings)
+
+
+def build_dag(source, target, stats=None):
+    """
+    Returns the PathDAG of the shortest paths from `source` to `target`,
+    or None if they're not connected.
+
+    Like `degrees.bidirectional_path`, grows whole levels from both
+    ends, always expanding the smaller side, until the two sides meet.
+    If a `stats` dict is given, the number of people expanded is stored
+    in stats["expanded"].
+    """
+    if stats is not None:
+        stats["expanded"] = 0
+
+    if source == target:
+        return PathDAG(source, target, 0, [source],
+                       {source: None}, {target: None})
+
+    # For each side, maps a reached person_id to the list of
+    # (movie_id, person_id) pairs one step closer to that side's start,
+    # and the person's distance from that start
+    parents = ({source: None}, {target: None})
+    depths = ({source: 0}, {target: 0})
+    frontiers = ([source], [target])
+
+    while frontiers[0] and frontiers[1]:
+
+        # Expand the smaller frontier, one whole level
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        parent, depth = parents[side], depths[side]
+        level = depth[frontiers[side][0]] + 1
+
+        next_frontier = []
+        for person_id in frontiers[side]:
+            if stats is not None:
+                stats["expanded"] += 1
+            for (movie_id, neighbor_id) in degrees.all_neighbors(person_id):
+                known = depth.get(neighbor_id)
+                if known is None:
+                    parent[neighbor_id] = [(movie_id, person_id)]
+                    depth[neighbor_id] = level
+                    next_frontier.append(neighbor_id)
+                elif known == level:
+                    parent[neighbor_id].append((movie_id, person_id))
+
+        # All shortest paths cross this level where it reaches the
+        # other side closest to its start
+        other_depth = depths[1 - side]
+        reached = [person_id for person_id in next_frontier
+                   if person_id in other_depth]
+        if reached:
+            closest = min(other_depth[person_id] for person_id in reached)
+            meetings = sorted(person_id for person_id in reached
+                              if other_depth[person_id] == closest)
+            return PathDAG(source, target, level + closest, meetings,
+                           prune(parents[0], meetings),
+                           prune(parents[1], meetings))
+
+        frontiers = ((next_frontier, frontiers[1]) if side == 0
+                     else (frontiers[0], next_frontier))
+
+    # No possible path
+    return None
+
+
+def prune(parent, meetings):
+    """
+    Keeps the entries of a search side's `parent` map that lead from
+    `meetings` back to its start, with their pairs sorted.
+    """
+    dag = {}
+    stack = list(meetings)
+    while stack:
+        person_id = stack.pop()
+        if person_id in dag:
+            continue
+        pairs = parent[person_id]
+        if pairs is None:
+            dag[person_id] = None
+            continue
+        pairs.sort()
+        dag[person_id] = pairs
+        stack.extend(previous for _, previous in pairs)
+    return dag
+
+
+def walk(person_id, dag):
+    """
+    Yields every walk in `dag` from `person_id` back to the start of its
+    side, as lists of (movie_id, person_id) pairs naming each person
+    stepped to and the movie connecting them, nearest first.
+    """
+    pairs = dag[person_id]
+    if pairs is None:
+        yield []
+        return
+    for step in pairs:
+        for rest in walk(step[1], dag):
+            yield [step] + rest
+
+
+def count_walks(dag):
+    """
+    Maps each person in `dag` to the number of its walks back to the
+    start of its side.
+    """
+    counts = {}
+
+    def count(person_id):
+        if person_id not in counts:
+            pairs = dag[person_id]
+            counts[person_id] = 1 if pairs is None else sum(
+                count(previous) for _, previous in pairs)
+        return counts[person_id]
+
+    for person_id in dag:
+        count(person_id)
+    return counts
+
+
+def all_shortest_paths(source, target):
+    """
+    Yields every shortest path from `source` to `target`, as lists of
+    (movie_id, person_id) pairs. Yields nothing if not connected.
+    """
+    dag = build_dag(source, target)
+    if dag is not None:
+        yield from dag.paths()
+
+
+def k_shortest_paths(source, target, k):
+    """
+    Returns a list of at most `k` shortest paths from `source` to
+    `target`, enumerating no more of them than that.
+    """
+    return list(islice(all_shortest_paths(source, target), k))
+
+
+def count_shortest_paths(source, target):
+    """
+    Returns the number of shortest paths from `source` to `target`.
+    """
+    dag = build_dag(source, target)
+    return 0 if dag is None else dag.count()
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python paths.py [directory] [limit]")
+    directory = sys.argv[1] if len(sys.argv) >= 2 else "large"
+    limit = int(sys.argv[2]) if len(sys.argv) == 3 else 10
+
+    print("Loading data...")
+    degrees.load_data(directory, compact=True)
+    print("Data loaded.")
+
+    source = degrees.person_id_for_name(input("Name: "))
+    if source is None:
+        sys.exit("Person not found.")
+    target = degrees.person_id_for_name(input("Name: "))
+    if target is None:
+        sys.exit("Person not found.")
+
+    dag = build_dag(source, target)
+    if dag is None:
+        print("Not connected.")
+        return
+    print(f"{dag.count()} shortest paths of {dag.length} degrees "
+          f"of separation.")
+    for path in islice(dag.paths(), limit):
+        people = [degrees.people[source]["name"]] + [
+            f"({degrees.movies[movie_id]['title']}) "
+            f"{degrees.people[person_id]['name']}"
+            for movie_id, person_id in path
+        ]
+        print(" -> ".join(people))
+
+
+if __name__ == "__main__":
+    main()
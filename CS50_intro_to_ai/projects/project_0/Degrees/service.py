@@ -0,0 +1,187 @@
+"""
+Batch and server front ends for degrees.py. Both load the data once
+and then answer any number of (source, target) queries.
+"""
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import degrees
+
+# Neighbor lists kept in memory across queries, and hubs precomputed
+CACHE_SIZE = 100000
+PRECOMPUTE = 1000
+
+
+def resolve(name):
+    """
+    Returns (person_id, error) for a name, which may also be
+    an IMDB person id.
+    """
+    person_ids = degrees.person_ids_for_name(name)
+    if len(person_ids) == 1:
+        return person_ids[0], None
+    elif len(person_ids) > 1:
+        return None, {
+            "error": f"Ambiguous name '{name}'.",
+            "candidates": [
+                {"id": person_id,
+                 "name": degrees.people[person_id]["name"],
+                 "birth": degrees.people[person_id]["birth"]}
+                for person_id in person_ids
+            ]
+        }
+    elif name in degrees.people:
+        return name, None
+    return None, {
+        "error": f"Person '{name}' not found.",
+        "suggestions": degrees.suggest_names(name)
+    }
+
+
+def answer(source_name, target_name):
+    """
+    Returns a JSON-serializable record answering one query.
+    """
+    record = {"source": source_name, "target": target_name}
+    source, error = resolve(source_name)
+    if error is None:
+        target, error = resolve(target_name)
+    if error is not None:
+        record.update(error)
+        return record
+
+    path = degrees.shortest_path(source, target, bidirectional=True)
+    if path is None:
+        record["degrees"] = None
+        record["path"] = None
+        return record
+
+    record["degrees"] = len(path)
+    record["path"] = [
+        {"movie_id": movie_id,
+         "movie": degrees.movies[movie_id]["title"],
+         "person_id": person_id,
+         "person": degrees.people[person_id]["name"]}
+        for movie_id, person_id in path
+    ]
+    return record
+
+
+def batch(lines, output):
+    """
+    Answers one query per tab-separated "source<TAB>target" line,
+    writing a JSON line for each as soon as it is answered.
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        fields = line.split("\t")
+        if len(fields) != 2:
+            record = {"line": number,
+                      "error": "Expected 'source<TAB>target'."}
+        else:
+            record = answer(fields[0].strip(), fields[1].strip())
+        output.write(json.dumps(record) + "\n")
+        output.flush()
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    Answers GET /path?source=NAME&target=NAME with a JSON record.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if (url.path != "/path"
+                or "source" not in query or "target" not in query):
+            self.send_json(400, {
+                "error": "Use /path?source=NAME&target=NAME"
+            })
+            return
+        self.send_json(200, answer(query["source"][0], query["target"][0]))
+
+    def send_json(self, status, record):
+        body = json.dumps(record).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledHTTPServer(HTTPServer):
+    """
+    HTTP server handling each connection on a fixed pool of threads.
+    """
+
+    def __init__(self, address, handler, workers=8):
+        super().__init__(address, handler)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def make_server(port=8050, workers=8):
+    """
+    Returns a server answering queries on localhost:`port`.
+    Data must already be loaded.
+    """
+    return PooledHTTPServer(("127.0.0.1", port), QueryHandler, workers)
+
+
+def main():
+    usage = ("Usage: python service.py batch [directory] [file]\n"
+             "       python service.py serve [directory] [port]")
+    if len(sys.argv) < 2 or len(sys.argv) > 4:
+        sys.exit(usage)
+    command, args = sys.argv[1], sys.argv[2:]
+    directory = args[0] if args else "large"
+    if command not in ("batch", "serve"):
+        sys.exit(usage)
+
+    print("Loading data...", file=sys.stderr)
+    degrees.load_data(directory, compact=True)
+    degrees.cache_neighbors(CACHE_SIZE, PRECOMPUTE)
+    print("Data loaded.", file=sys.stderr)
+
+    if command == "batch":
+        if len(args) == 2 and args[1] != "-":
+            with open(args[1], encoding="utf-8") as f:
+                batch(f, sys.stdout)
+        else:
+            batch(sys.stdin, sys.stdout)
+    else:
+        port = int(args[1]) if len(args) == 2 else 8050
+        server = make_server(port)
+        print(f"Serving on http://127.0.0.1:{port}/path", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Binary snapshot of a CompactGraph, written next to the CSV files so
+later runs can memory-map it instead of parsing the CSVs again.
+
+Layout:
+    MAGIC, then a little header of (version, header length),
+    then a JSON header describing the source CSVs and every section,
+    then the sections themselves, each aligned to 8 bytes and
+    located by an offset from the end of the header.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+from graph import (CompactGraph, SortedIndex, SortedMultiIndex,
+                   StringTable)
+from lookup import NameIndex
+
+MAGIC = b"DEGRSNAP"
+VERSION = 2
+PREFIX = struct.Struct("<II")
+FILENAME = "degrees.snapshot"
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# String tables and arrays of a graph, by attribute name
+STRING_TABLES = ("person_ids", "person_names", "person_births",
+                 "movie_ids", "movie_titles", "movie_years")
+ARRAYS = ("person_offsets", "person_movies", "movie_offsets", "movie_people")
+
+
+def load_graph(directory, processes=1, stats=None):
+    """
+    Returns the CompactGraph for the CSV files in `directory`, mapped
+    from its snapshot when the snapshot matches the CSVs, otherwise
+    parsed from the CSVs (see CompactGraph.from_csv) and saved as a
+    new snapshot.
+    """
+    path = os.path.join(directory, FILENAME)
+    graph = load(path, directory)
+    if graph is not None:
+        return graph
+
+    sources = fingerprint(directory)
+    graph = CompactGraph.from_csv(directory, processes, stats)
+    graph.name_lookup = NameIndex.build(sorted(graph.name_index))
+    try:
+        save(graph, path, sources)
+    except OSError:
+        # A read-only data directory only costs the speedup
+        pass
+    return graph
+
+
+def fingerprint(directory):
+    """
+    Returns the size, modification time and hash of each source CSV.
+    """
+    sources = {}
+    for name in SOURCES:
+        path = os.path.join(directory, name)
+        stat = os.stat(path)
+        sources[name] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha1": file_hash(path)
+        }
+    return sources
+
+
+def file_hash(path):
+    """
+    Returns the SHA-1 hex digest of the file at `path`.
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_fresh(sources, directory):
+    """
+    Checks that the CSVs in `directory` are the ones recorded in
+    `sources`. Files whose mtime changed are hashed, so a touched but
+    unchanged file doesn't invalidate the snapshot.
+    """
+    for name, recorded in sources.items():
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if stat.st_size != recorded["size"]:
+            return False
+        if (stat.st_mtime_ns != recorded["mtime_ns"]
+                and file_hash(path) != recorded["sha1"]):
+            return False
+    return True
+
+
+def sections_of(graph):
+    """
+    Returns (name, buffer, typecode) for every section of `graph`,
+    converting freshly built lists and dicts to their table form.
+    """
+    sections = []
+    tables = {}
+    for name in STRING_TABLES:
+        table = getattr(graph, name)
+        if not isinstance(table, StringTable):
+            table = StringTable.build(table)
+        tables[name] = table
+        sections.append((f"{name}.offsets", table.offsets, "q"))
+        sections.append((f"{name}.blob", table.blob, "B"))
+
+    for name, keys in (("person_index", tables["person_ids"]),
+                       ("movie_index", tables["movie_ids"])):
+        index = getattr(graph, name)
+        if not isinstance(index, SortedIndex):
+            index = SortedIndex.build(keys)
+        sections.append((f"{name}.order", index.order, "i"))
+
+    names = graph.name_index
+    if not isinstance(names, SortedMultiIndex):
+        names = SortedMultiIndex.build(names)
+    sections.append(("name_index.keys.offsets", names.keys.offsets, "q"))
+    sections.append(("name_index.keys.blob", names.keys.blob, "B"))
+    sections.append(("name_index.offsets", names.offsets, "i"))
+    sections.append(("name_index.values", names.values, "i"))
+
+    # The name lookup shares its sorted keys with the name index
+    lookup = graph.name_lookup
+    if lookup is None:
+        lookup = NameIndex.build(names.keys)
+    sections.append(("name_lookup.grams.offsets", lookup.grams.offsets, "q"))
+    sections.append(("name_lookup.grams.blob", lookup.grams.blob, "B"))
+    sections.append(("name_lookup.offsets", lookup.offsets, "i"))
+    sections.append(("name_lookup.postings", lookup.postings, "i"))
+
+    for name in ARRAYS:
+        sections.append((name, getattr(graph, name), "i"))
+    return sections
+
+
+def save(graph, path, sources):
+    """
+    Writes `graph` to a snapshot at `path`, recording `sources`.
+    """
+    sections = [(name, memoryview(buffer).cast("B"), typecode)
+                for name, buffer, typecode in sections_of(graph)]
+
+    # Section offsets are relative to the end of the header
+    table = {}
+    offset = 0
+    for name, data, typecode in sections:
+        table[name] = [offset, data.nbytes, typecode]
+        offset = align(offset + data.nbytes)
+    header = json.dumps({
+        "byteorder": sys.byteorder,
+        "sources": sources,
+        "sections": table
+    }).encode("utf-8")
+    data_start = align(len(MAGIC) + PREFIX.size + len(header))
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(PREFIX.pack(VERSION, len(header)))
+        f.write(header)
+        for name, data, typecode in sections:
+            f.write(b"\0" * (data_start + table[name][0] - f.tell()))
+            f.write(data)
+    os.replace(temporary, path)
+
+
+def load(path, directory):
+    """
+    Returns the graph mapped from the snapshot at `path`, or None if
+    there is no usable snapshot for the CSVs in `directory`.
+    """
+    try:
+        with open(path, "rb") as f:
+            snapshot = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    start = len(MAGIC) + PREFIX.size
+    if snapshot[:len(MAGIC)] != MAGIC or len(snapshot) < start:
+        return None
+    version, header_length = PREFIX.unpack(snapshot[len(MAGIC):start])
+    if version != VERSION:
+        return None
+    try:
+        header = json.loads(snapshot[start:start + header_length])
+    except ValueError:
+        return None
+    if (header["byteorder"] != sys.byteorder
+            or not is_fresh(header["sources"], directory)):
+        return None
+
+    view = memoryview(snapshot)
+    data_start = align(start + header_length)
+    sections = {}
+    for name, (offset, size, typecode) in header["sections"].items():
+        offset += data_start
+        section = view[offset:offset + size]
+        if typecode != "B":
+            section = section.cast(typecode)
+        sections[name] = section
+
+    graph = CompactGraph()
+    graph.snapshot = snapshot
+    for name in STRING_TABLES:
+        setattr(graph, name, StringTable(sections[f"{name}.offsets"],
+                                         sections[f"{name}.blob"]))
+    graph.person_index = SortedIndex(graph.person_ids,
+                                     sections["person_index.order"])
+    graph.movie_index = SortedIndex(graph.movie_ids,
+                                    sections["movie_index.order"])
+    graph.name_index = SortedMultiIndex(
+        StringTable(sections["name_index.keys.offsets"],
+                    sections["name_index.keys.blob"]),
+        sections["name_index.offsets"],
+        sections["name_index.values"]
+    )
+    graph.name_lookup = NameIndex(
+        graph.name_index.keys,
+        StringTable(sections["name_lookup.grams.offsets"],
+                    sections["name_lookup.grams.blob"]),
+        sections["name_lookup.offsets"],
+        sections["name_lookup.postings"]
+    )
+    for name in ARRAYS:
+        setattr(graph, name, sections[name])
+    return graph
+
+
+def align(offset):
+    """
+    Rounds `offset` up to a multiple of 8.
+    """
+    return (offset + 7) & ~7
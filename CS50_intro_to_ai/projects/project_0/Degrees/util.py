@@ -1,3 +1,7 @@
+import threading
+from collections import OrderedDict, deque
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -6,24 +10,35 @@ class Node():
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+
+        # Number of nodes in the frontier for each state,
+        # so contains_state doesn't have to scan the frontier
+        self.states = {}
 
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
 
+    def _discard(self, node):
+        count = self.states[node.state] - 1
+        if count:
+            self.states[node.state] = count
+        else:
+            del self.states[node.state]
+        return node
+
     def remove(self):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
-            return node
+            return self._discard(self.frontier.pop())
 
 
 class QueueFrontier(StackFrontier):
@@ -32,6 +47,46 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
-            return node
+            return self._discard(self.frontier.popleft())
+
+
+class LRUCache():
+    """
+    Thread-safe mapping that keeps at most `size` recently used
+    entries, plus any number of pinned entries that are never evicted.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.pinned = {}
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.pinned.get(key)
+            if value is None:
+                value = self.entries.get(key)
+                if value is not None:
+                    self.entries.move_to_end(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            if key in self.pinned or self.size <= 0:
+                return
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def pin(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.pinned[key] = value
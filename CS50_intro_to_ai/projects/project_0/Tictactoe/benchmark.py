@@ -0,0 +1,271 @@
+"""
+Compares the transposition-table minimax of tictactoe.py with the
+original search, which copied the board at every node and never
+remembered a position, and the list boards of tictactoe.py with the
+bitboards of bitboard.py.
+"""
+import sys
+import time
+from copy import deepcopy
+
+import bitboard
+import mnk
+import tictactoe as ttt
+
+# Boards visited by the original search
+legacy_stats = {"nodes": 0}
+
+
+def legacy_max_val(board):
+    legacy_stats["nodes"] += 1
+    if ttt.terminal(board):
+        return ttt.utility(board)
+    v = -2
+    for action in ttt.actions(board):
+        b = deepcopy(board)
+        v = max(v, legacy_min_val(ttt.result(b, action)))
+        if v == 1:
+            return 1
+    return v
+
+
+def legacy_min_val(board):
+    legacy_stats["nodes"] += 1
+    if ttt.terminal(board):
+        return ttt.utility(board)
+    v = 2
+    for action in ttt.actions(board):
+        b = deepcopy(board)
+        v = min(v, legacy_max_val(ttt.result(b, action)))
+        if v == -1:
+            return -1
+    return v
+
+
+def legacy_minimax(board):
+    """
+    The original `minimax`, copying the board at every node.
+    """
+    if ttt.terminal(board):
+        return None
+    result_action = None
+    pc = ttt.player(board)
+    value = 2 if pc == ttt.O else -2
+    for action in ttt.actions(board):
+        next_board = ttt.result(deepcopy(board), action)
+        if pc == ttt.X:
+            v = legacy_min_val(next_board)
+            if v > value:
+                result_action, value = action, v
+        else:
+            v = legacy_max_val(next_board)
+            if v < value:
+                result_action, value = action, v
+    return result_action
+
+
+def first_moves():
+    """
+    Returns the boards the AI moves first on: empty when it plays X,
+    and after each opening move of X when it plays O.
+    """
+    boards = [ttt.initial_state()]
+    for i, j in ttt.actions(ttt.initial_state()):
+        board = ttt.initial_state()
+        board[i][j] = ttt.X
+        boards.append(board)
+    return boards
+
+
+def reachable_boards():
+    """
+    Returns every board reachable from the empty board.
+    """
+    boards = {}
+    stack = [ttt.initial_state()]
+    while stack:
+        board = stack.pop()
+        key = str(board)
+        if key in boards:
+            continue
+        boards[key] = board
+        if not ttt.terminal(board):
+            for action in ttt.actions(board):
+                stack.append(ttt.result(deepcopy(board), action))
+    return list(boards.values())
+
+
+def compare_table():
+    """
+    Prints the nodes and time of the first moves of the original
+    search and of the search with a transposition table.
+    """
+    boards = first_moves()
+
+    legacy_stats["nodes"] = 0
+    start = time.perf_counter()
+    legacy_minimax(boards[0])
+    seconds = time.perf_counter() - start
+    print(f"original, first move: {legacy_stats['nodes']} nodes, "
+          f"{1000 * seconds:.1f} ms")
+
+    # A cold table for the first move, then every opening reply
+    # with the table kept warm, searching without the opening book
+    ttt.table.clear()
+    saved, ttt.book = ttt.book, None
+    try:
+        for name, positions in (("table, first move", boards[:1]),
+                                ("table, replies to X", boards[1:])):
+            ttt.stats.update(nodes=0, hits=0)
+            start = time.perf_counter()
+            for board in positions:
+                ttt.minimax(board)
+            seconds = time.perf_counter() - start
+            print(f"{name}: {ttt.stats['nodes']} nodes, "
+                  f"{ttt.stats['hits']} table hits, {1000 * seconds:.1f} ms")
+    finally:
+        ttt.book = saved
+    print(f"table size: {len(ttt.table)} positions")
+
+
+def compare_bitboard(repeat=20):
+    """
+    Times the board functions of tictactoe.py and of bitboard.py over
+    every reachable board, checking that they agree, then times a cold
+    search from the empty board with each.
+    """
+    boards = reachable_boards()
+    bitboards = [bitboard.Bitboard.from_list(board) for board in boards]
+    for board, b in zip(boards, bitboards):
+        if (ttt.player(board) != b.player()
+                or ttt.winner(board) != b.winner()
+                or ttt.terminal(board) != b.terminal()
+                or sorted(ttt.actions(board))
+                != [bitboard.CELLS[bit] for bit in b.actions()]):
+            raise Exception(f"engines disagree on {board}")
+
+    def move(board):
+        for action in ttt.actions(board):
+            ttt.result(board, action)
+            board[action[0]][action[1]] = ttt.EMPTY
+
+    def bitboard_move(b):
+        for bit in b.actions():
+            b.make(bit)
+            b.unmake(bit)
+
+    calls = (
+        ("player", ttt.player, bitboard.Bitboard.player),
+        ("actions", ttt.actions, bitboard.Bitboard.actions),
+        ("winner", ttt.winner, bitboard.Bitboard.winner),
+        ("terminal", ttt.terminal, bitboard.Bitboard.terminal),
+        ("every move", move, bitboard_move),
+    )
+    for name, lists, bits in calls:
+        timings = []
+        for function, positions in ((lists, boards), (bits, bitboards)):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for board in positions:
+                    function(board)
+            timings.append(time.perf_counter() - start)
+        calls_made = repeat * len(boards)
+        print(f"{name}: lists {1e6 * timings[0] / calls_made:.2f} us, "
+              f"bitboards {1e6 * timings[1] / calls_made:.2f} us, "
+              f"{timings[0] / timings[1]:.1f}x")
+
+    ttt.table.clear()
+    saved, ttt.book = ttt.book, None
+    try:
+        start = time.perf_counter()
+        ttt.minimax(ttt.initial_state())
+        lists = time.perf_counter() - start
+    finally:
+        ttt.book = saved
+    bitboard.table.clear()
+    start = time.perf_counter()
+    bitboard.best_move(bitboard.Bitboard())
+    bits = time.perf_counter() - start
+    print(f"first move, cold table: lists {1000 * lists:.1f} ms, "
+          f"bitboards {1000 * bits:.1f} ms "
+          f"({len(bitboard.table)} positions, no symmetry reduction)")
+
+
+def compare_workers(depth=7, workers=(1, 2, 4)):
+    """
+    Searches 4x4 boards (4 in a row) to `depth` with the root moves
+    split over each number of `workers`, checking that every number of
+    workers plays the same move, and prints the speedups.
+    """
+    openings = ([], [(1, 1)], [(1, 1), (2, 2)], [(0, 0), (1, 2), (2, 1)])
+    timings = {}
+    for count in workers:
+        game = mnk.MNKGame(4, 4, 4, workers=count)
+        if count > 1:
+            game.executor()
+        start = time.perf_counter()
+        results = []
+        for moves in openings:
+            board = game.initial_state()
+            for action in moves:
+                board = game.result(board, action)
+            results.append(game.analyse(board, depth))
+        timings[count] = time.perf_counter() - start
+        game.close()
+
+        if count == workers[0]:
+            expected = results
+        elif results != expected:
+            raise Exception(f"{count} workers found {results}, "
+                            f"not {expected}")
+        print(f"{count} workers: {timings[count]:.2f} s, "
+              f"{timings[workers[0]] / timings[count]:.2f}x")
+
+
+def check_budget(budget=0.3, workers=(1, 2, 4), slack=0.15):
+    """
+    Times moves with a time budget on 5x5 (4 in a row) and 7x7 (5 in a
+    row) boards with each number of `workers`, and raises if a move
+    takes longer than `budget` plus `slack` seconds.
+    """
+    for m, n, k in ((5, 5, 4), (7, 7, 5)):
+        for count in workers:
+            game = mnk.MNKGame(m, n, k, budget=budget, workers=count)
+            if count > 1:
+                game.executor()
+            board = game.initial_state()
+            slowest = 0
+            try:
+                for _ in range(3):
+                    start = time.perf_counter()
+                    action = game.minimax(board)
+                    slowest = max(slowest, time.perf_counter() - start)
+                    board = game.result(board, action)
+            finally:
+                game.close()
+            print(f"{m}x{n}x{k}, {count} workers: slowest move "
+                  f"{slowest:.2f} s of a {budget} s budget")
+            if slowest > budget + slack:
+                raise Exception(f"{count} workers overran the budget "
+                                f"on {m}x{n}x{k}")
+
+
+def main():
+    usage = ("Usage: python benchmark.py table|bitboard\n"
+             "       python benchmark.py parallel [depth]")
+    if len(sys.argv) < 2:
+        sys.exit(usage)
+    command, args = sys.argv[1], sys.argv[2:]
+    if command == "table" and not args:
+        compare_table()
+    elif command == "bitboard" and not args:
+        compare_bitboard()
+    elif command == "parallel" and len(args) <= 1:
+        compare_workers(int(args[0]) if args else 7)
+        check_budget()
+    else:
+        sys.exit(usage)
+
+
+if __name__ == "__main__":
+    main()
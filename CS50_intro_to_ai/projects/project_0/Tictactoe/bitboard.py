@@ -0,0 +1,263 @@
+"""
+Tic Tac Toe on bitboards.
+
+A board is two 9-bit masks, one for the cells of X and one for the
+cells of O, with cell (i, j) at bit 3 * i + j. Everything a search asks
+of a board is then a table lookup or a bit operation, and moves are
+made and taken back in place.
+
+The functions at the bottom take and return the list boards of
+tictactoe.py, so this module can stand in for it, e.g. in runner.py
+with `import bitboard as ttt`.
+"""
+from tictactoe import X, O, EMPTY
+
+FULL = (1 << 9) - 1
+
+# Cell (i, j) of each bit
+CELLS = [(i, j) for i in range(3) for j in range(3)]
+
+# Masks of the 8 lines of three: rows, columns and diagonals
+WIN_MASKS = (
+    [0b111 << (3 * i) for i in range(3)]
+    + [0b1001001 << j for j in range(3)]
+    + [0b100010001, 0b001010100]
+)
+
+# For each of the 512 masks: whether it holds a line, how many cells
+# it has, and the bits of those cells
+WINS = bytes(any(mask & line == line for line in WIN_MASKS)
+             for mask in range(FULL + 1))
+COUNTS = bytes(bin(mask).count("1") for mask in range(FULL + 1))
+BITS = [tuple(bit for bit in range(9) if mask >> bit & 1)
+        for mask in range(FULL + 1)]
+
+# Minimax values of searched boards, keyed by Bitboard.key()
+table = {}
+
+# Boards visited by `value`, and how many were found in the table
+stats = {"nodes": 0, "hits": 0}
+
+
+class Bitboard():
+    """
+    A board as the masks `x` and `o` of the cells each player holds.
+    """
+
+    __slots__ = ("x", "o")
+
+    def __init__(self, x=0, o=0):
+        self.x = x
+        self.o = o
+
+    @classmethod
+    def from_list(cls, board):
+        """
+        Returns the Bitboard of a tictactoe.py board.
+        """
+        x = o = 0
+        for bit, (i, j) in enumerate(CELLS):
+            if board[i][j] == X:
+                x |= 1 << bit
+            elif board[i][j] == O:
+                o |= 1 << bit
+        return cls(x, o)
+
+    def to_list(self):
+        """
+        Returns the board as a tictactoe.py board.
+        """
+        board = [[EMPTY, EMPTY, EMPTY] for _ in range(3)]
+        for bit, (i, j) in enumerate(CELLS):
+            if self.x >> bit & 1:
+                board[i][j] = X
+            elif self.o >> bit & 1:
+                board[i][j] = O
+        return board
+
+    def key(self):
+        """
+        Returns a single integer identifying the board.
+        """
+        return self.x << 9 | self.o
+
+    def player(self):
+        """
+        Returns the player who has the next turn.
+        """
+        return X if COUNTS[self.x] == COUNTS[self.o] else O
+
+    def actions(self):
+        """
+        Returns the bits of the empty cells.
+        """
+        return BITS[FULL & ~(self.x | self.o)]
+
+    def result(self, bit):
+        """
+        Returns a new board with the next player's move at `bit`.
+        """
+        if (self.x | self.o) >> bit & 1:
+            raise Exception("Invalid action")
+        if COUNTS[self.x] == COUNTS[self.o]:
+            return Bitboard(self.x | 1 << bit, self.o)
+        return Bitboard(self.x, self.o | 1 << bit)
+
+    def make(self, bit):
+        """
+        Plays the next player's move at `bit` on this board.
+        """
+        if COUNTS[self.x] == COUNTS[self.o]:
+            self.x |= 1 << bit
+        else:
+            self.o |= 1 << bit
+
+    def unmake(self, bit):
+        """
+        Takes back the move at `bit`.
+        """
+        self.x &= ~(1 << bit)
+        self.o &= ~(1 << bit)
+
+    def winner(self):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        if WINS[self.x]:
+            return X
+        elif WINS[self.o]:
+            return O
+        return None
+
+    def terminal(self):
+        """
+        Returns True if game is over, False otherwise.
+        """
+        return bool(WINS[self.x] or WINS[self.o]
+                    or self.x | self.o == FULL)
+
+    def utility(self):
+        """
+        Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+        """
+        if WINS[self.x]:
+            return 1
+        elif WINS[self.o]:
+            return -1
+        return 0
+
+
+def value(board):
+    """
+    Returns the minimax value of a Bitboard, memoized in `table`.
+    The board is searched in place and left as it was.
+    """
+    stats["nodes"] += 1
+    key = board.key()
+    if key in table:
+        stats["hits"] += 1
+        return table[key]
+
+    if board.terminal():
+        v = board.utility()
+    elif board.player() == X:
+        v = -2
+        for bit in board.actions():
+            board.make(bit)
+            v = max(v, value(board))
+            board.unmake(bit)
+            if v == 1:
+                break
+    else:
+        v = 2
+        for bit in board.actions():
+            board.make(bit)
+            v = min(v, value(board))
+            board.unmake(bit)
+            if v == -1:
+                break
+
+    table[key] = v
+    return v
+
+
+def best_move(board):
+    """
+    Returns the bit of the optimal move on a Bitboard,
+    or None if the game is over.
+    """
+    if board.terminal():
+        return None
+
+    maximizing = board.player() == X
+    best, best_value = None, None
+    for bit in board.actions():
+        board.make(bit)
+        v = value(board)
+        board.unmake(bit)
+        if (best_value is None or (v > best_value if maximizing
+                                   else v < best_value)):
+            best, best_value = bit, v
+    return best
+
+
+# The list board API of tictactoe.py
+
+def initial_state():
+    """
+    Returns starting state of the board.
+    """
+    return Bitboard().to_list()
+
+
+def player(board):
+    """
+    Returns player who has the next turn on a board.
+    """
+    return Bitboard.from_list(board).player()
+
+
+def actions(board):
+    """
+    Returns set of all possible actions (i, j) available on the board.
+    """
+    return {CELLS[bit] for bit in Bitboard.from_list(board).actions()}
+
+
+def result(board, action):
+    """
+    Returns the board that results from making move (i, j) on the board,
+    leaving the original board unmodified.
+    """
+    bit = CELLS.index(tuple(action))
+    return Bitboard.from_list(board).result(bit).to_list()
+
+
+def winner(board):
+    """
+    Returns the winner of the game, if there is one.
+    """
+    return Bitboard.from_list(board).winner()
+
+
+def terminal(board):
+    """
+    Returns True if game is over, False otherwise.
+    """
+    return Bitboard.from_list(board).terminal()
+
+
+def utility(board):
+    """
+    Returns 1 if X has won the game, -1 if O has won, 0 otherwise
+    given a terminal board.
+    """
+    return Bitboard.from_list(board).utility()
+
+
+def minimax(board):
+    """
+    Returns the optimal action for the current player on the board.
+    """
+    bit = best_move(Bitboard.from_list(board))
+    return None if bit is None else CELLS[bit]
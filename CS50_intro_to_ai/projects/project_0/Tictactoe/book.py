@@ -0,0 +1,158 @@
+"""
+Builds and verifies the opening book of tictactoe.py: the minimax value
+and best move of every reachable board, so that `minimax` answers with
+a single lookup. See tictactoe.BOOK_PATH for the file format.
+
+Usage: python book.py build|verify
+"""
+import os
+import sys
+import time
+
+import tictactoe as ttt
+
+
+def search_value(board):
+    """
+    Returns the minimax value of a board by live search.
+    """
+    if ttt.player(board) == ttt.X:
+        return ttt.max_val(board)
+    return ttt.min_val(board)
+
+
+def reachable(board=None):
+    """
+    Yields every board reachable from `board` (the empty board by
+    default) once. The same list is played on in place and yielded
+    each time, so copy it to keep it.
+    """
+    board = ttt.initial_state() if board is None else board
+    seen = set()
+    stack = [None]
+    while stack:
+        move = stack.pop()
+        if move is not None:
+            if move[0] == "unmake":
+                board[move[1]][move[2]] = ttt.EMPTY
+                continue
+            i, j = move[1], move[2]
+            board[i][j] = ttt.player(board)
+            stack.append(("unmake", i, j))
+
+        code = ttt.encode(board)
+        if code in seen:
+            continue
+        seen.add(code)
+        yield board
+        if not ttt.terminal(board):
+            for i, j in ttt.actions(board):
+                stack.append(("make", i, j))
+
+
+def build(path=ttt.BOOK_PATH):
+    """
+    Searches every reachable board and writes the book to `path`.
+    Returns the number of boards in the book.
+    """
+    book = bytearray([ttt.MISSING]) * ttt.BOOK_SIZE
+    saved, ttt.book = ttt.book, None
+    try:
+        for board in reachable():
+            if ttt.terminal(board):
+                value, move = ttt.utility(board), ttt.NO_MOVE
+            else:
+                i, j = ttt.minimax(board)
+                value, move = search_value(board), 3 * i + j
+            book[ttt.encode(board)] = (value + 1) << 4 | move
+    finally:
+        ttt.book = saved
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(book)
+    os.replace(temporary, path)
+    ttt.book = ttt.load_book(path)
+    return len(book) - book.count(ttt.MISSING)
+
+
+def verify(path=ttt.BOOK_PATH):
+    """
+    Cross-checks the book at `path` against live search: every
+    reachable board must have the searched value, and its move must
+    be legal and keep that value. Returns a list of error messages.
+    """
+    book = ttt.load_book(path)
+    if book is None:
+        return [f"no book at {path}"]
+
+    errors = []
+    saved, ttt.book = ttt.book, None
+    reached = set()
+    try:
+        for board in reachable():
+            code = ttt.encode(board)
+            reached.add(code)
+            entry = book[code]
+            if entry == ttt.MISSING:
+                errors.append(f"missing {board}")
+                continue
+            value, move = (entry >> 4) - 1, entry & 0x0F
+            if ttt.terminal(board):
+                if value != ttt.utility(board) or move != ttt.NO_MOVE:
+                    errors.append(f"wrong end of game {board}")
+                continue
+
+            expected = search_value(board)
+            i, j = divmod(move, 3)
+            if value != expected:
+                errors.append(f"value {value}, not {expected}, of {board}")
+            elif move > 8 or board[i][j] is not ttt.EMPTY:
+                errors.append(f"illegal move {(i, j)} on {board}")
+            else:
+                board[i][j] = ttt.player(board)
+                moved = search_value(board)
+                board[i][j] = ttt.EMPTY
+                if moved != expected:
+                    errors.append(f"move {(i, j)} loses value on {board}")
+    finally:
+        ttt.book = saved
+
+    extra = sum(1 for code, entry in enumerate(book)
+                if entry != ttt.MISSING and code not in reached)
+    if extra:
+        errors.append(f"{extra} entries for unreachable boards")
+    return errors
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] not in ("build", "verify"):
+        sys.exit("Usage: python book.py build|verify")
+
+    if sys.argv[1] == "build":
+        start = time.perf_counter()
+        count = build()
+        print(f"Wrote {count} boards to {ttt.BOOK_PATH} "
+              f"in {time.perf_counter() - start:.2f} s.")
+        return
+
+    errors = verify()
+    for error in errors[:20]:
+        print(error)
+    if errors:
+        sys.exit(f"{len(errors)} errors.")
+
+    # Time the book against live search with a warm table
+    board = ttt.initial_state()
+    for name, book in (("live search", None), ("book", ttt.book)):
+        ttt.book = book
+        start = time.perf_counter()
+        for _ in range(1000):
+            ttt.minimax(board)
+        seconds = (time.perf_counter() - start) / 1000
+        print(f"{name}: {1e6 * seconds:.1f} us per first move")
+    print("Book verified.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+"""
+m,n,k games: Tic Tac Toe on an m x n board, won with k in a row.
+
+MNKGame has the functions of tictactoe.py as methods, on list boards of
+m rows and n columns, so runner.py can play any of them. Its minimax is
+an alpha-beta search with move ordering (centre first, then corners,
+then killer moves from sibling positions) and iterative deepening, so
+it answers within a time budget: when the budget runs out, it plays the
+best move of the last depth searched to the end. The root moves can be
+searched on several processes, with the same result as one.
+"""
+import math
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from tictactoe import X, O, EMPTY
+
+# Score of a won position, less the number of moves taken to win it,
+# so that faster wins (and slower losses) are preferred
+WIN = 1 << 30
+
+# Nodes searched between checks of the clock
+CHECK_EVERY = 128
+
+# Seconds between checks for a cancelled or timed out parallel search
+POLL_INTERVAL = 0.05
+
+# The game of a worker process of a parallel search, and the bound it
+# shares with the other workers (see init_worker)
+worker_game = None
+worker_bound = None
+
+
+class Timeout(Exception):
+    """
+    Raised inside a search when its time budget runs out,
+    or when it is cancelled.
+    """
+
+
+class MNKGame():
+    """
+    The game on `m` rows and `n` columns won by `k` in a row, whose AI
+    spends about `budget` seconds on a move, searching on `workers`
+    processes.
+
+    Boards are searched as bitmasks of the cells of each player, cell
+    (i, j) being bit i * n + j.
+    """
+
+    # The cell values of tictactoe.py, for code using a game in its place
+    X, O, EMPTY = X, O, EMPTY
+
+    def __init__(self, m=3, n=3, k=3, budget=1.0, workers=1):
+        if k > max(m, n):
+            raise Exception(f"{k} in a row can't fit on {m}x{n}")
+        self.m = m
+        self.n = n
+        self.k = k
+        self.budget = budget
+        self.workers = workers
+        self.full = (1 << (m * n)) - 1
+
+        # Masks of every k-in-a-row line, and the lines through each cell
+        self.lines = []
+        for i in range(m):
+            for j in range(n):
+                for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_i, end_j = i + di * (k - 1), j + dj * (k - 1)
+                    if 0 <= end_i < m and 0 <= end_j < n:
+                        self.lines.append(sum(
+                            1 << ((i + di * step) * n + j + dj * step)
+                            for step in range(k)))
+        self.lines_through = [[line for line in self.lines if line >> cell & 1]
+                              for cell in range(m * n)]
+
+        # Static move order: the centre cells, then the corners,
+        # then the rest by distance from the centre
+        centre_i, centre_j = (m - 1) / 2, (n - 1) / 2
+        corners = {0, n - 1, (m - 1) * n, m * n - 1}
+
+        def priority(cell):
+            i, j = divmod(cell, n)
+            distance = math.hypot(i - centre_i, j - centre_j)
+            return (distance > 0.75, cell not in corners, distance)
+
+        self.order = sorted(range(m * n), key=priority)
+
+        # Number of positions searched by the last minimax, and the
+        # deepest search it completed
+        self.nodes = 0
+        self.depth = 0
+
+        self.deadline = math.inf
+        self.cancel = None
+        self.killers = []
+
+        # Worker processes, created on the first parallel search
+        self.pool = None
+        self.bound = None
+        self.stop = None
+
+    # The list board API of tictactoe.py
+
+    def initial_state(self):
+        """
+        Returns starting state of the board.
+        """
+        return [[EMPTY] * self.n for _ in range(self.m)]
+
+    def player(self, board):
+        """
+        Returns player who has the next turn on a board.
+        """
+        x, o = self.masks(board)
+        return X if bin(x).count("1") == bin(o).count("1") else O
+
+    def actions(self, board):
+        """
+        Returns set of all possible actions (i, j) available on the board.
+        """
+        return {(i, j) for i, row in enumerate(board)
+                for j, cell in enumerate(row) if cell is EMPTY}
+
+    def result(self, board, action):
+        """
+        Returns the board that results from making move (i, j) on the
+        board, leaving the original board unmodified.
+        """
+        i, j = action
+        if board[i][j] is not EMPTY:
+            raise Exception("Invalid action")
+        new_board = [list(row) for row in board]
+        new_board[i][j] = self.player(board)
+        return new_board
+
+    def winner(self, board):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        x, o = self.masks(board)
+        for line in self.lines:
+            if x & line == line:
+                return X
+            if o & line == line:
+                return O
+        return None
+
+    def terminal(self, board):
+        """
+        Returns True if game is over, False otherwise.
+        """
+        x, o = self.masks(board)
+        return self.winner(board) is not None or x | o == self.full
+
+    def utility(self, board):
+        """
+        Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+        """
+        return {X: 1, O: -1, None: 0}[self.winner(board)]
+
+    def minimax(self, board, cancel=None):
+        """
+        Returns the best action for the current player found within
+        the time budget, or None if the game is over.
+
+        If a threading.Event `cancel` is given, the search stops soon
+        after it is set, returning None if it hadn't found a move yet.
+        """
+        if self.terminal(board):
+            return None
+        x, o = self.masks(board)
+        me, opp = (x, o) if self.player(board) == X else (o, x)
+        self.cancel = cancel
+        try:
+            cell = self.best_move(me, opp)
+        finally:
+            self.cancel = None
+        return None if cell is None else divmod(cell, self.n)
+
+    def analyse(self, board, depth):
+        """
+        Returns (score, action) of the best move for the current player,
+        searched exactly `depth` moves ahead with no time budget. The
+        score is for the player to move.
+        """
+        x, o = self.masks(board)
+        me, opp = (x, o) if self.player(board) == X else (o, x)
+        cells = bin(self.full & ~(x | o)).count("1")
+        self.nodes = 0
+        self.killers = [[] for _ in range(cells + 1)]
+        self.deadline = math.inf
+        if self.workers > 1:
+            score, cell = self.search_root_parallel(me, opp, depth)
+        else:
+            score, cell = self.search_root(me, opp, depth)
+        return score, divmod(cell, self.n)
+
+    def masks(self, board):
+        """
+        Returns the bitmasks of the cells of X and of O.
+        """
+        x = o = 0
+        for i, row in enumerate(board):
+            for j, cell in enumerate(row):
+                if cell == X:
+                    x |= 1 << (i * self.n + j)
+                elif cell == O:
+                    o |= 1 << (i * self.n + j)
+        return x, o
+
+    # Search
+
+    def best_move(self, me, opp):
+        """
+        Returns the cell of the best move for the player whose cells are
+        `me`, searching deeper and deeper until the budget runs out or
+        the game is solved. Returns None if cancelled before any move
+        was found.
+        """
+        empty = self.full & ~(me | opp)
+        cells = bin(empty).count("1")
+        self.nodes = 0
+        self.depth = 0
+        self.killers = [[] for _ in range(cells + 1)]
+
+        best = None
+        start = time.perf_counter()
+        for depth in range(1, cells + 1):
+
+            # The first depth always runs to the end, so there is a move
+            self.deadline = (math.inf if best is None
+                             else start + self.budget)
+            try:
+                if self.workers > 1:
+                    score, best = self.search_root_parallel(
+                        me, opp, depth, best)
+                else:
+                    score, best = self.search_root(me, opp, depth, best)
+            except Timeout:
+                break
+            self.depth = depth
+
+            # A forced win or loss within the horizon won't change
+            if abs(score) > WIN - cells - 1:
+                break
+        return best
+
+    def search_root(self, me, opp, depth, first=None):
+        """
+        Returns (score, cell) of the best move at `depth`, searching
+        `first` (the best move of the previous depth) first.
+        """
+        alpha, best = -math.inf, None
+        for cell in self.root_moves(me, opp, first):
+            score = self.score_move(me, opp, cell, depth, alpha, math.inf, 0)
+            if score > alpha:
+                alpha, best = score, cell
+        return alpha, best
+
+    def search_root_parallel(self, me, opp, depth, first=None):
+        """
+        Returns the same (score, cell) as `search_root`, searching the
+        root moves on `workers` processes.
+
+        The workers share the best score found so far and the position
+        of its move in the search order, and search each move with that
+        score as alpha. Moves ordered before the one holding the bound
+        search with alpha - 1 instead, so that they still find a score
+        equal to the bound and take the tie, as they would searched in
+        order. The move returned doesn't depend on the number of workers
+        or on how their searches interleave.
+        """
+        moves = self.root_moves(me, opp, first)
+        pool = self.executor()
+        with self.bound.get_lock():
+            self.bound[0], self.bound[1] = 0, -1
+        self.stop.clear()
+
+        # Workers have their own clocks, so pass them a wall clock time
+        deadline = self.deadline
+        if deadline != math.inf:
+            deadline = time.time() + deadline - time.perf_counter()
+
+        futures = [pool.submit(search_move, me, opp, cell, index, depth,
+                               deadline)
+                   for index, cell in enumerate(moves)]
+        try:
+            pending = futures
+            while pending:
+                _, pending = wait(pending, timeout=POLL_INTERVAL)
+                if (time.perf_counter() > self.deadline
+                        or self.cancel is not None and self.cancel.is_set()):
+                    raise Timeout()
+        finally:
+            if pending:
+                self.stop.set()
+                wait(pending)
+
+        results = [future.result() for future in futures]
+        if None in results:
+            raise Timeout()
+        self.nodes += sum(nodes for _, nodes in results)
+
+        # The highest score, the first in the search order on ties
+        index = min(range(len(moves)), key=lambda i: (-results[i][0], i))
+        return results[index][0], moves[index]
+
+    def root_moves(self, me, opp, first=None):
+        """
+        Returns the moves at the root in the order to search them,
+        `first` first.
+        """
+        empty = self.full & ~(me | opp)
+        moves = self.ordered(empty, 0)
+        if first is not None:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def executor(self):
+        """
+        Returns the pool of worker processes, starting it if needed.
+        """
+        if self.pool is None:
+            self.bound = multiprocessing.Array("q", 2)
+            self.stop = multiprocessing.Event()
+            self.pool = ProcessPoolExecutor(
+                self.workers, initializer=init_worker,
+                initargs=(self.m, self.n, self.k, self.bound, self.stop))
+        return self.pool
+
+    def close(self):
+        """
+        Shuts down the worker processes, if any.
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def negamax(self, me, opp, depth, alpha, beta, ply):
+        """
+        Returns the score of a position for the player to move, whose
+        cells are `me`, searched `depth` moves ahead with alpha-beta.
+        """
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0 and (
+                time.perf_counter() > self.deadline
+                or self.cancel is not None and self.cancel.is_set()):
+            raise Timeout()
+
+        empty = self.full & ~(me | opp)
+        if not empty:
+            return 0
+        if depth == 0:
+            return self.evaluate(me, opp)
+
+        best = -math.inf
+        for cell in self.ordered(empty, ply):
+            score = self.score_move(me, opp, cell, depth, alpha, beta, ply)
+            if score > best:
+                best = score
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                killers = self.killers[ply]
+                if cell not in killers:
+                    killers.insert(0, cell)
+                    del killers[2:]
+                break
+        return best
+
+    def score_move(self, me, opp, cell, depth, alpha, beta, ply):
+        """
+        Returns the score of playing at `cell` for the player to move.
+        """
+        mine = me | 1 << cell
+        for line in self.lines_through[cell]:
+            if mine & line == line:
+                return WIN - ply
+        return -self.negamax(opp, mine, depth - 1, -beta, -alpha, ply + 1)
+
+    def ordered(self, empty, ply):
+        """
+        Returns the empty cells in the order to search them at `ply`:
+        the killer moves first, then the static order.
+        """
+        moves = [cell for cell in self.order if empty >> cell & 1]
+        for killer in reversed(self.killers[ply]):
+            if empty >> killer & 1:
+                moves.remove(killer)
+                moves.insert(0, killer)
+        return moves
+
+    def evaluate(self, me, opp):
+        """
+        Returns a heuristic score of an unfinished position for the
+        player to move: lines still open to a player count for them,
+        more the more of their cells they hold.
+        """
+        score = 0
+        for line in self.lines:
+            if not line & opp:
+                score += 1 << (2 * bin(line & me).count("1"))
+            elif not line & me:
+                score -= 1 << (2 * bin(line & opp).count("1"))
+        return score
+
+
+def init_worker(m, n, k, bound, stop):
+    """
+    Sets up a worker process of a parallel search. `bound` holds the
+    best score found so far among the root moves and the position of
+    its move (-1 when there is none yet); `stop` cancels the searches.
+    """
+    global worker_game, worker_bound
+    worker_game = MNKGame(m, n, k)
+    worker_game.cancel = stop
+    worker_bound = bound
+
+
+def search_move(me, opp, cell, index, depth, deadline):
+    """
+    Searches root move `cell`, number `index` in the search order, in a
+    worker process, and returns (score, nodes searched), or None if the
+    search was stopped. The score is exact if it beats the bound the
+    search started with, and a bound no higher than that otherwise.
+    """
+    game = worker_game
+
+    # A move still queued when the search is stopped or out of time
+    # would otherwise only notice after searching CHECK_EVERY nodes
+    if game.cancel.is_set() or time.time() > deadline:
+        return None
+
+    with worker_bound.get_lock():
+        value, holder = worker_bound[0], worker_bound[1]
+    if holder < 0:
+        alpha = -math.inf
+    elif index < holder:
+        alpha = value - 1
+    else:
+        alpha = value
+
+    game.nodes = 0
+    game.killers = [[] for _ in range(bin(game.full & ~(me | opp))
+                                      .count("1") + 1)]
+    game.deadline = deadline
+    if deadline != math.inf:
+        game.deadline = time.perf_counter() + deadline - time.time()
+    try:
+        score = game.score_move(me, opp, cell, depth, alpha, math.inf, 0)
+    except Timeout:
+        return None
+
+    if score > alpha:
+        with worker_bound.get_lock():
+            if (worker_bound[1] < 0 or score > worker_bound[0]
+                    or score == worker_bound[0] and index < worker_bound[1]):
+                worker_bound[0], worker_bound[1] = score, index
+    return score, game.nodes
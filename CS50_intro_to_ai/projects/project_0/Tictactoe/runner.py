@@ -1,9 +1,18 @@
 import pygame
 import sys
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
+import mnk
 import tictactoe as ttt
 
+# python runner.py [m n k] plays k in a row on m rows and n columns
+if len(sys.argv) == 4:
+    m, n, k = (int(arg) for arg in sys.argv[1:])
+    ttt = mnk.MNKGame(m, n, k)
+elif len(sys.argv) != 1:
+    sys.exit("Usage: python runner.py [m n k]")
+
 pygame.init()
 size = width, height = 600, 400
 
@@ -15,18 +24,57 @@ screen = pygame.display.set_mode(size)
 
 mediumFont = pygame.font.Font("OpenSans-Regular.ttf", 28)
 largeFont = pygame.font.Font("OpenSans-Regular.ttf", 40)
-moveFont = pygame.font.Font("OpenSans-Regular.ttf", 60)
 
 user = None
 board = ttt.initial_state()
-ai_turn = False
+
+# The AI thinks on a worker thread so the window keeps drawing:
+# `ai_move` is the Future of the move being computed, if any, and
+# setting `cancel` asks that search to stop
+FPS = 60
+clock = pygame.time.Clock()
+worker = ThreadPoolExecutor(max_workers=1)
+ai_move = None
+cancel = threading.Event()
+
+
+def think(board, cancel):
+    """
+    Returns the AI's move on `board`. Searches of an MNKGame stop soon
+    after `cancel` is set; other searches are short enough to finish,
+    and their move is dropped.
+    """
+    if isinstance(ttt, mnk.MNKGame):
+        return ttt.minimax(board, cancel)
+    return ttt.minimax(board)
+
+
+def stop_thinking():
+    """
+    Cancels the AI's move being computed, if any.
+    """
+    global ai_move
+    cancel.set()
+    ai_move = None
+
+
+# Shrink the tiles to fit boards larger than 3x3
+rows, cols = len(board), len(board[0])
+tile_size = min(80, (height - 120) // rows, (width - 40) // cols)
+moveFont = pygame.font.Font("OpenSans-Regular.ttf", tile_size * 3 // 4)
 
 while True:
     
 
+    # Act on clicks when the button is released, once per click
+    click = None
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
+            stop_thinking()
+            worker.shutdown(wait=False)
             sys.exit()
+        elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
+            click = event.pos
 
     screen.fill(black)
 
@@ -55,26 +103,21 @@ while True:
         screen.blit(playO, playORect)
 
         # Check if button is clicked
-        click, _, _ = pygame.mouse.get_pressed()
-        if click == 1:
-            mouse = pygame.mouse.get_pos()
-            if playXButton.collidepoint(mouse):
-                time.sleep(0.2)
+        if click is not None:
+            if playXButton.collidepoint(click):
                 user = ttt.X
-            elif playOButton.collidepoint(mouse):
-                time.sleep(0.2)
+            elif playOButton.collidepoint(click):
                 user = ttt.O
 
     else:
 
         # Draw game board
-        tile_size = 80
-        tile_origin = (width / 2 - (1.5 * tile_size),
-                       height / 2 - (1.5 * tile_size))
+        tile_origin = (width / 2 - (cols / 2 * tile_size),
+                       height / 2 - (rows / 2 * tile_size))
         tiles = []
-        for i in range(3):
+        for i in range(rows):
             row = []
-            for j in range(3):
+            for j in range(cols):
                 rect = pygame.Rect(
                     tile_origin[0] + j * tile_size,
                     tile_origin[1] + i * tile_size,
@@ -103,29 +146,28 @@ while True:
         elif user == player:
             title = f"Play as {user}"
         else:
-            title = f"Computer thinking..."
+            dots = pygame.time.get_ticks() // 300 % 4
+            title = "Computer thinking" + "." * dots
         title = largeFont.render(title, True, white)
         titleRect = title.get_rect()
         titleRect.center = ((width / 2), 30)
         screen.blit(title, titleRect)
 
-        # Check for AI move
+        # Check for AI move, searching a copy of the board
         if user != player and not game_over:
-            if ai_turn:
-                time.sleep(0.5)
-                move = ttt.minimax(board)
-                board = ttt.result(board, move)
-                ai_turn = False
-            else:
-                ai_turn = True
+            if ai_move is None:
+                cancel = threading.Event()
+                ai_move = worker.submit(think, [list(row) for row in board],
+                                        cancel)
+            elif ai_move.done():
+                board = ttt.result(board, ai_move.result())
+                ai_move = None
 
         # Check for a user move
-        click, _, _ = pygame.mouse.get_pressed()
-        if click == 1 and user == player and not game_over:
-            mouse = pygame.mouse.get_pos()
-            for i in range(3):
-                for j in range(3):
-                    if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(mouse)):
+        if click is not None and user == player and not game_over:
+            for i in range(rows):
+                for j in range(cols):
+                    if (board[i][j] == ttt.EMPTY and tiles[i][j].collidepoint(click)):
                         board = ttt.result(board, (i, j))
 
         if game_over:
@@ -135,13 +177,10 @@ while True:
             againRect.center = againButton.center
             pygame.draw.rect(screen, white, againButton)
             screen.blit(again, againRect)
-            click, _, _ = pygame.mouse.get_pressed()
-            if click == 1:
-                mouse = pygame.mouse.get_pos()
-                if againButton.collidepoint(mouse):
-                    time.sleep(0.2)
-                    user = None
-                    board = ttt.initial_state()
-                    ai_turn = False
+            if click is not None and againButton.collidepoint(click):
+                stop_thinking()
+                user = None
+                board = ttt.initial_state()
 
     pygame.display.flip()
+    clock.tick(FPS)
@@ -1,14 +1,51 @@
 """
 Tic Tac Toe Player
 """
-from copy import deepcopy
 import math
+import os
 
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Base 3 digit of each cell value, for `encode` and `canonical`
+DIGITS = {EMPTY: 0, X: 1, O: 2}
+
+# The 8 rotations and reflections of the board, each listing for every
+# cell (counted row by row) the cell of the original board it shows
+SYMMETRIES = [
+    (0, 1, 2, 3, 4, 5, 6, 7, 8),
+    (2, 5, 8, 1, 4, 7, 0, 3, 6),
+    (8, 7, 6, 5, 4, 3, 2, 1, 0),
+    (6, 3, 0, 7, 4, 1, 8, 5, 2),
+    (2, 1, 0, 5, 4, 3, 8, 7, 6),
+    (6, 7, 8, 3, 4, 5, 0, 1, 2),
+    (0, 3, 6, 1, 4, 7, 2, 5, 8),
+    (8, 5, 2, 7, 4, 1, 6, 3, 0),
+]
+
+# Transposition table: maps the canonical encoding of a board to its
+# minimax value, shared by every search in the process. A board's value
+# doesn't depend on how it was reached, and symmetric boards have the
+# same value.
+table = {}
+
+# Boards visited by max_val and min_val, and how many of them were
+# found in the table
+stats = {"nodes": 0, "hits": 0}
+
+# Opening book written by `python book.py build`: one byte for each
+# base 3 encoding of a board (see `encode`), holding
+#     (value + 1) << 4 | 3 * i + j
+# for the board's minimax value and best move (i, j), with NO_MOVE as
+# the move of finished boards and MISSING for unreachable boards
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         "book.bin")
+BOOK_SIZE = 3 ** 9
+NO_MOVE = 0x0F
+MISSING = 0xFF
+
 
 def initial_state():
     """
@@ -162,52 +199,123 @@ def actual_value(pc_player, board):
         return utility_val
 
 def max_val(board):
+    """
+    Returns the minimax value of a board with X to move,
+    looking it up in the transposition table when it's there.
+    """
+    stats["nodes"] += 1
+    key = canonical(board)
+    if key in table:
+        stats["hits"] += 1
+        return table[key]
+
     if terminal(board):
-        return utility(board)
-    v = -2
-    
-    for action in actions(board):
-        b = deepcopy(board)
-        v = max(v, min_val(result(b, action)))
-        if v == 1:
-            return 1
+        v = utility(board)
+    else:
+        v = -2
+        for i, j in actions(board):
+            # Make the move in place and take it back afterwards
+            board[i][j] = X
+            v = max(v, min_val(board))
+            board[i][j] = EMPTY
+            if v == 1:
+                break
+
+    table[key] = v
     return v
 
 def min_val(board):
+    """
+    Returns the minimax value of a board with O to move,
+    looking it up in the transposition table when it's there.
+    """
+    stats["nodes"] += 1
+    key = canonical(board)
+    if key in table:
+        stats["hits"] += 1
+        return table[key]
+
     if terminal(board):
-        return utility(board)
-    v = 2
-    
-    for action in actions(board):
-        b = deepcopy(board)
-        v = min(v, max_val(result(b, action)))
-        if v == -1:
-            return -1
+        v = utility(board)
+    else:
+        v = 2
+        for i, j in actions(board):
+            board[i][j] = O
+            v = min(v, max_val(board))
+            board[i][j] = EMPTY
+            if v == -1:
+                break
+
+    table[key] = v
     return v
 
 
+def canonical(board):
+    """
+    Returns the same integer for a board and each of its rotations
+    and reflections: the smallest base 3 encoding among them.
+    """
+    cells = [DIGITS[cell] for row in board for cell in row]
+    return min(sum(cells[k] * 3 ** n for n, k in enumerate(symmetry))
+               for symmetry in SYMMETRIES)
+
+
+def encode(board):
+    """
+    Returns the base 3 encoding of a board, first cell lowest.
+    """
+    code = 0
+    for row in reversed(board):
+        for cell in reversed(row):
+            code = 3 * code + DIGITS[cell]
+    return code
+
+
+def load_book(path=BOOK_PATH):
+    """
+    Returns the opening book at `path`, or None if there is no
+    complete book there.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    return data if len(data) == BOOK_SIZE else None
+
+
 def minimax(board):
     """
     Returns the optimal action for the current player on the board.
     """
+    if book is not None:
+        entry = book[encode(board)]
+        if entry != MISSING:
+            move = entry & 0x0F
+            return None if move == NO_MOVE else divmod(move, 3)
+
     if terminal(board):
         return None
 
-    
     result_action = None
     pc = player(board)
     value = 2 if pc == O else -2
 
     for action in actions(board):
-        b = deepcopy(board)
-        next_board = result(b, action)
-        
-        
+        i, j = action
+        board[i][j] = pc
+
         if pc == X:
-            v = min_val(next_board)
+            v = min_val(board)
             result_action, value = (action, v) if v > value else (result_action, value)
         else:
-            v = max_val(next_board)
+            v = max_val(board)
             result_action, value = (action, v) if v < value else (result_action, value)
 
+        board[i][j] = EMPTY
+
     return result_action
+
+
+# Opening book, if it has been built
+book = load_book()
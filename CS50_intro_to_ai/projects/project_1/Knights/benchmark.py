@@ -0,0 +1,170 @@
+"""
+Times model checking of the Knights puzzles with the interpreted, the
+compiled and (if NumPy is installed) the vectorized evaluation of
+logic.py, with the SAT solver of sat.py and by resolution, checking
+that they agree. Then times the SAT solver and resolution on knowledge
+bases of hundreds of symbols, far past what enumerating models can do,
+the solver both from scratch for each query and with sat.KnowledgeBase,
+which encodes the knowledge once.
+"""
+import random
+import time
+
+from logic import (And, Biconditional, Implication, Not, Or, Symbol,
+                   model_check, model_check_interpreted,
+                   model_check_vectorized)
+import puzzle
+import resolution
+import sat
+
+SYMBOLS = [puzzle.AKnight, puzzle.AKnave, puzzle.BKnight, puzzle.BKnave,
+           puzzle.CKnight, puzzle.CKnave]
+PUZZLES = [puzzle.knowledge0, puzzle.knowledge1, puzzle.knowledge2,
+           puzzle.knowledge3]
+
+
+def solve(check, repeat):
+    """
+    Returns the symbols entailed by each puzzle with `check`,
+    and the seconds taken to solve every puzzle `repeat` times.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        answers = [[symbol for symbol in SYMBOLS if check(knowledge, symbol)]
+                   for knowledge in PUZZLES]
+    return answers, time.perf_counter() - start
+
+
+def chain(size):
+    """
+    Returns (knowledge, query) where knowledge is P0 and Pi => Pi+1
+    for `size` symbols, and query is the last symbol.
+    """
+    symbols = [Symbol(f"P{i}") for i in range(size)]
+    knowledge = And(symbols[0], *(Implication(symbols[i], symbols[i + 1])
+                                  for i in range(size - 1)))
+    return knowledge, symbols[-1]
+
+
+def islanders(size, seed=0):
+    """
+    Returns (knowledge, knights) for a puzzle of `size` islanders, each a
+    knight or a knave, each saying something about two others that is
+    true exactly when the speaker is a knight. The islanders' kinds are
+    drawn at random first, so the puzzle has a solution, and `knights`
+    maps each "is a Knight" symbol to whether it holds in it.
+    """
+    rng = random.Random(seed)
+    knight = [Symbol(f"{i} is a Knight") for i in range(size)]
+    knave = [Symbol(f"{i} is a Knave") for i in range(size)]
+    kinds = [rng.random() < 0.5 for _ in range(size)]
+
+    knowledge = And()
+    for i in range(size):
+        knowledge.add(Or(knight[i], knave[i]))
+        knowledge.add(Not(And(knight[i], knave[i])))
+
+        j, k = rng.sample([other for other in range(size) if other != i], 2)
+        statements = [
+            (knave[j], not kinds[j]),
+            (Biconditional(knight[j], knight[k]), kinds[j] == kinds[k]),
+            (Or(knave[j], knight[k]), not kinds[j] or kinds[k]),
+            (Implication(knight[j], knave[k]), not kinds[j] or not kinds[k]),
+        ]
+        statement, true = rng.choice(statements)
+        if true != kinds[i]:
+            statement = Not(statement)
+        knowledge.add(Biconditional(knight[i], statement))
+    return knowledge, dict(zip(knight, kinds))
+
+
+def main(repeat=20, size=14, large=(100, 200, 400),
+         resolution_islanders=10):
+    checks = [("interpreted", model_check_interpreted),
+              ("compiled", model_check),
+              ("sat", sat.entails),
+              ("resolution", resolution.entails)]
+    try:
+        import numpy
+        checks.append(("vectorized", model_check_vectorized))
+    except ImportError:
+        print("NumPy is not installed, skipping the vectorized check.")
+
+    expected, slow = solve(model_check_interpreted, repeat)
+    count = repeat * len(PUZZLES) * len(SYMBOLS)
+    for name, check in checks:
+        answers, seconds = solve(check, repeat)
+        if answers != expected:
+            raise Exception(f"{name} found {answers}, not {expected}")
+        print(f"{name}: {1000 * seconds / count:.3f} ms per check, "
+              f"{slow / seconds:.1f}x")
+
+    # A larger knowledge base, where enumerating models dominates
+    knowledge, query = chain(size)
+    for name, check in checks:
+        start = time.perf_counter()
+        if not check(knowledge, query):
+            raise Exception(f"{name} check of the chain failed")
+        print(f"{name}, {size} symbols: "
+              f"{1000 * (time.perf_counter() - start):.1f} ms")
+
+    # Only the SAT solver and resolution get through these
+    for count in large:
+        knowledge, query = chain(count)
+        start = time.perf_counter()
+        if not sat.entails(knowledge, query):
+            raise Exception("sat check of the chain failed")
+        print(f"sat, chain of {count} symbols: "
+              f"{1000 * (time.perf_counter() - start):.1f} ms")
+
+        stats = {}
+        if not resolution.entails(knowledge, query, stats):
+            raise Exception("resolution check of the chain failed")
+        print(f"resolution, chain of {count} symbols: "
+              f"{1000 * stats['seconds']:.1f} ms, "
+              f"{stats['generated']} generated, {stats['subsumed']} subsumed")
+
+        knowledge, knights = islanders(count)
+        stats = {}
+        known = 0
+        start = time.perf_counter()
+        for symbol, kind in knights.items():
+            if sat.entails(knowledge, symbol, stats):
+                if not kind:
+                    raise Exception(f"sat found the knave {symbol}")
+                known += 1
+        print(f"sat, {count} islanders ({2 * count} symbols, "
+              f"{stats['clauses']} clauses, {known} known knights): "
+              f"{1000 * (time.perf_counter() - start) / count:.1f} ms "
+              f"per check")
+
+        # The same queries against one knowledge base, encoded once
+        start = time.perf_counter()
+        knowledge_base = sat.KnowledgeBase(*knowledge.conjuncts)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        if sum(map(knowledge_base.entails, knights)) != known:
+            raise Exception("knowledge base disagrees with sat")
+        print(f"knowledge base, {count} islanders: "
+              f"{1000 * built:.1f} ms to build, "
+              f"{1000 * (time.perf_counter() - start) / count:.2f} ms "
+              f"per check")
+
+
+    # Resolution on islanders, whose biconditionals make the number of
+    # resolvents grow quickly; ten are still quick
+    knowledge, knights = islanders(resolution_islanders)
+    totals = {"generated": 0, "subsumed": 0, "seconds": 0}
+    for symbol, kind in knights.items():
+        stats = {}
+        if resolution.entails(knowledge, symbol, stats) and not kind:
+            raise Exception(f"resolution found the knave {symbol}")
+        for name in totals:
+            totals[name] += stats[name]
+    print(f"resolution, {resolution_islanders} islanders: "
+          f"{1000 * totals['seconds'] / len(knights):.1f} ms, "
+          f"{totals['generated'] // len(knights)} generated and "
+          f"{totals['subsumed'] // len(knights)} subsumed per check")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,54 @@
+import functools
 import itertools
+import weakref
 
+# Number of functions compiled by compile_sentence kept for reuse,
+# the least recently used being dropped first
+COMPILED_CACHE_SIZE = 256
 
-class Sentence():
+# Every sentence in use, by its class and the ids of its operands (the
+# name, for a Symbol), so that making an equal sentence again returns
+# the one that exists
+interned = weakref.WeakValueDictionary()
+
+
+def intern(cls, operands):
+    """
+    Returns the sentence of class `cls` with `operands`,
+    making it only if there isn't one already.
+    """
+    key = (cls,) + tuple(operand if isinstance(operand, str) else id(operand)
+                         for operand in operands)
+    sentence = interned.get(key)
+    if sentence is None:
+        sentence = type.__call__(cls, *operands)
+        interned[key] = sentence
+    return sentence
+
+
+class Interned(type):
+    """
+    Metaclass of the sentences. Sentences are immutable and hash-consed:
+    making one equal to a sentence that exists returns that sentence, so
+    equal subsentences are shared, and each computes its hash and its
+    symbols once, from those of its operands.
+
+    The exception is a conjunction made with And(...), which can still
+    be added to. It is made anew each time, and replaced by an interned
+    copy when it becomes an operand of another sentence.
+    """
+
+    def __call__(cls, *operands):
+        operands = cls.prepare(operands)
+        if cls.extensible:
+            return super().__call__(*operands)
+        return intern(cls, operands)
+
+
+class Sentence(metaclass=Interned):
+
+    # Whether sentences of the class can change once made
+    extensible = False
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
@@ -12,14 +59,46 @@ class Sentence():
         return ""
 
     def symbols(self):
-        """Returns a set of all symbols in the logical sentence."""
-        return set()
+        """Returns a frozenset of all symbols in the logical sentence."""
+        return frozenset()
+
+    def expression(self, index):
+        """
+        Returns Python source for the sentence's truth value in a model
+        `m`, an integer whose bit index[name] is the value of symbol name.
+        """
+        raise Exception("nothing to compile")
+
+    def evaluate_vector(self, model):
+        """
+        Evaluates the sentence in many models at once: `model` maps each
+        symbol to a NumPy boolean array of its values, one per model.
+        """
+        raise Exception("nothing to evaluate")
 
     @classmethod
     def validate(cls, sentence):
         if not isinstance(sentence, Sentence):
             raise TypeError("must be a logical sentence")
 
+    @classmethod
+    def prepare(cls, operands):
+        """Validates the operands of a new sentence, sharing each one."""
+        return tuple(Sentence.share(operand) for operand in operands)
+
+    @classmethod
+    def share(cls, sentence):
+        """
+        Returns the immutable sentence equal to `sentence`: the sentence
+        itself, or the interned copy of a conjunction made with And(...).
+        """
+        Sentence.validate(sentence)
+        if not sentence.extensible:
+            return sentence
+        shared = intern(And, sentence.conjuncts)
+        shared.extensible = False
+        return shared
+
     @classmethod
     def parenthesize(cls, s):
         """Parenthesizes an expression if not already parenthesized."""
@@ -46,16 +125,23 @@ class Symbol(Sentence):
 
     def __init__(self, name):
         self.name = name
+        self.hash_value = hash(("symbol", name))
+        self.symbol_set = frozenset([name])
 
     def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+        return self is other or (
+            isinstance(other, Symbol) and self.name == other.name)
 
     def __hash__(self):
-        return hash(("symbol", self.name))
+        return self.hash_value
 
     def __repr__(self):
         return self.name
 
+    @classmethod
+    def prepare(cls, operands):
+        return operands
+
     def evaluate(self, model):
         try:
             return bool(model[self.name])
@@ -66,19 +152,33 @@ class Symbol(Sentence):
         return self.name
 
     def symbols(self):
-        return {self.name}
+        return self.symbol_set
+
+    def expression(self, index):
+        try:
+            return f"(m & {1 << index[self.name]})"
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
+
+    def evaluate_vector(self, model):
+        try:
+            return model[self.name]
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
 
 
 class Not(Sentence):
     def __init__(self, operand):
-        Sentence.validate(operand)
         self.operand = operand
+        self.hash_value = hash(("not", hash(operand)))
+        self.symbol_set = operand.symbols()
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return self is other or (
+            isinstance(other, Not) and self.operand == other.operand)
 
     def __hash__(self):
-        return hash(("not", hash(self.operand)))
+        return self.hash_value
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -90,22 +190,39 @@ class Not(Sentence):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
     def symbols(self):
-        return self.operand.symbols()
+        return self.symbol_set
+
+    def expression(self, index):
+        return f"(not {self.operand.expression(index)})"
+
+    def evaluate_vector(self, model):
+        import numpy as np
+        return np.logical_not(self.operand.evaluate_vector(model))
 
 
 class And(Sentence):
+
+    extensible = True
+
     def __init__(self, *conjuncts):
-        for conjunct in conjuncts:
-            Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
+        self.names = set().union(*(conjunct.symbols()
+                                   for conjunct in conjuncts))
+
+        # Computed when first asked for, and again after an add
+        self.hash_value = None
+        self.symbol_set = None
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return self is other or (
+            isinstance(other, And) and self.conjuncts == other.conjuncts)
 
     def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+        if self.hash_value is None:
+            self.hash_value = hash(
+                ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
+            )
+        return self.hash_value
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,8 +231,13 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
-        Sentence.validate(conjunct)
+        if not self.extensible:
+            raise Exception("can't add to a conjunction inside a sentence")
+        conjunct = Sentence.share(conjunct)
         self.conjuncts.append(conjunct)
+        self.names.update(conjunct.symbols())
+        self.hash_value = None
+        self.symbol_set = None
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
@@ -127,22 +249,39 @@ class And(Sentence):
                            for conjunct in self.conjuncts])
 
     def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+        if self.symbol_set is None:
+            self.symbol_set = frozenset(self.names)
+        return self.symbol_set
+
+    def expression(self, index):
+        if not self.conjuncts:
+            return "True"
+        return "(" + " and ".join(conjunct.expression(index)
+                                  for conjunct in self.conjuncts) + ")"
+
+    def evaluate_vector(self, model):
+        import numpy as np
+        result = np.True_
+        for conjunct in self.conjuncts:
+            result = np.logical_and(result, conjunct.evaluate_vector(model))
+        return result
 
 
 class Or(Sentence):
     def __init__(self, *disjuncts):
-        for disjunct in disjuncts:
-            Sentence.validate(disjunct)
         self.disjuncts = list(disjuncts)
+        self.hash_value = hash(
+            ("or", tuple(hash(disjunct) for disjunct in disjuncts))
+        )
+        self.symbol_set = frozenset().union(*(disjunct.symbols()
+                                              for disjunct in disjuncts))
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return self is other or (
+            isinstance(other, Or) and self.disjuncts == other.disjuncts)
 
     def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+        return self.hash_value
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -158,23 +297,37 @@ class Or(Sentence):
                             for disjunct in self.disjuncts])
 
     def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+        return self.symbol_set
+
+    def expression(self, index):
+        if not self.disjuncts:
+            return "False"
+        return "(" + " or ".join(disjunct.expression(index)
+                                 for disjunct in self.disjuncts) + ")"
+
+    def evaluate_vector(self, model):
+        import numpy as np
+        result = np.False_
+        for disjunct in self.disjuncts:
+            result = np.logical_or(result, disjunct.evaluate_vector(model))
+        return result
 
 
 class Implication(Sentence):
     def __init__(self, antecedent, consequent):
-        Sentence.validate(antecedent)
-        Sentence.validate(consequent)
         self.antecedent = antecedent
         self.consequent = consequent
+        self.hash_value = hash(("implies", hash(antecedent), hash(consequent)))
+        self.symbol_set = antecedent.symbols() | consequent.symbols()
 
     def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return self is other or (
+            isinstance(other, Implication)
+            and self.antecedent == other.antecedent
+            and self.consequent == other.consequent)
 
     def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        return self.hash_value
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -189,23 +342,34 @@ class Implication(Sentence):
         return f"{antecedent} => {consequent}"
 
     def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+        return self.symbol_set
+
+    def expression(self, index):
+        return (f"(not {self.antecedent.expression(index)} "
+                f"or {self.consequent.expression(index)})")
+
+    def evaluate_vector(self, model):
+        import numpy as np
+        return np.logical_or(
+            np.logical_not(self.antecedent.evaluate_vector(model)),
+            self.consequent.evaluate_vector(model))
 
 
 class Biconditional(Sentence):
     def __init__(self, left, right):
-        Sentence.validate(left)
-        Sentence.validate(right)
         self.left = left
         self.right = right
+        self.hash_value = hash(("biconditional", hash(left), hash(right)))
+        self.symbol_set = left.symbols() | right.symbols()
 
     def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return self is other or (
+            isinstance(other, Biconditional)
+            and self.left == other.left
+            and self.right == other.right)
 
     def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        return self.hash_value
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -222,11 +386,92 @@ class Biconditional(Sentence):
         return f"{left} <=> {right}"
 
     def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+        return self.symbol_set
+
+    def expression(self, index):
+        return (f"((not {self.left.expression(index)}) == "
+                f"(not {self.right.expression(index)}))")
+
+    def evaluate_vector(self, model):
+        import numpy as np
+        return np.equal(self.left.evaluate_vector(model),
+                        self.right.evaluate_vector(model))
+
+
+def compile_sentence(sentence, index):
+    """
+    Compiles a sentence into a function of a model `m`, an integer whose
+    bit index[name] is the value of symbol name, returning whether the
+    sentence is true in that model.
+
+    Sentences compiling to the same source share one function, so
+    checking many queries against the same knowledge compiles it once.
+    """
+    return compile_source(sentence.expression(index))
+
+
+@functools.lru_cache(maxsize=COMPILED_CACHE_SIZE)
+def compile_source(source):
+    """
+    Compiles the source of an expression of a model `m` into a function.
+    """
+    return eval(f"lambda m: {source}")
 
 
 def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+    """
+    Checks if knowledge base entails query.
+
+    Both are compiled (see `compile_sentence`), and the models are
+    enumerated as the integers below 2 ** (number of symbols): the
+    query must be true in every model where the knowledge is. Sentences
+    nested too deeply for Python to compile are checked with
+    `model_check_interpreted` instead.
+    """
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    index = {symbol: i for i, symbol in enumerate(symbols)}
+    try:
+        knows = compile_sentence(knowledge, index)
+        holds = compile_sentence(query, index)
+    except (SyntaxError, RecursionError, MemoryError):
+        return model_check_interpreted(knowledge, query)
+    return all(map(holds, filter(knows, range(1 << len(symbols)))))
+
+
+def model_check_vectorized(knowledge, query, block_size=1 << 16):
+    """
+    Checks if knowledge base entails query, evaluating both sentences
+    with NumPy over blocks of `block_size` models at a time (see
+    `Sentence.evaluate_vector`), so memory stays bounded however many
+    symbols there are. Model number i of the 2 ** n gives symbol number
+    b (in sorted order) the value of bit b of i.
+
+    Needs NumPy, which is only imported when this is called.
+    """
+    import numpy as np
+
+    symbols = sorted(knowledge.symbols() | query.symbols())
+    count = 1 << len(symbols)
+    for start in range(0, count, block_size):
+        models = np.arange(start, min(start + block_size, count),
+                           dtype=np.int64)
+        model = {symbol: (models >> i & 1).astype(bool)
+                 for i, symbol in enumerate(symbols)}
+
+        # In every model, either the knowledge is false or the query true
+        entailed = np.logical_or(
+            np.logical_not(knowledge.evaluate_vector(model)),
+            query.evaluate_vector(model))
+        if not np.all(entailed):
+            return False
+    return True
+
+
+def model_check_interpreted(knowledge, query):
+    """
+    Checks if knowledge base entails query, evaluating both sentences
+    in a dict model for each assignment of their symbols.
+    """
 
     def check_all(knowledge, query, symbols, model):
         """Checks if knowledge base entails query, given a particular model."""
@@ -257,7 +502,7 @@ def model_check(knowledge, query):
                     check_all(knowledge, query, remaining, model_false))
 
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+    symbols = set(knowledge.symbols() | query.symbols())
 
     # Check that knowledge entails query
     return check_all(knowledge, query, symbols, dict())
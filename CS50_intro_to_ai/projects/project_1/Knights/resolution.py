@@ -0,0 +1,144 @@
+"""
+Entailment by resolution: knowledge entails query exactly when the
+clauses of knowledge ∧ ¬query resolve to the empty clause.
+
+The clauses are those of sat.CNF, with clauses as frozensets of
+literals. The search follows the set-of-support strategy: every
+resolution involves at least one clause descended from the negated
+query, so the knowledge's clauses are never resolved with each other.
+Clauses are picked shortest first, and a clause is dropped when another
+clause's literals are a subset of its own (subsumption). Each literal
+indexes the clauses it appears in, so a clause is only paired with the
+clauses holding the complement of one of its literals.
+
+Set-of-support needs the knowledge to be consistent: with inconsistent
+knowledge, a query may be wrongly found not entailed.
+"""
+import heapq
+import itertools
+import time
+
+from sat import CNF
+
+
+class Prover():
+    """
+    The clauses of a resolution search: `clauses` holds the clauses kept
+    so far, `index` maps each literal to those of them that contain it,
+    and `support` holds the clauses of the set of support still to
+    resolve, shortest first.
+    """
+
+    def __init__(self):
+        self.clauses = set()
+        self.index = {}
+        self.support = []
+        self.counter = itertools.count()
+        self.stats = {"generated": 0, "subsumed": 0}
+
+    def subsumed(self, clause):
+        """
+        Returns True if a kept clause is a subset of `clause`.
+        """
+        for lit in clause:
+            for other in self.index.get(lit, ()):
+                if len(other) <= len(clause) and other <= clause:
+                    return True
+        return False
+
+    def keep(self, clause):
+        """
+        Keeps a clause, dropping the kept clauses it subsumes.
+        """
+        rarest = min(clause, key=lambda lit: len(self.index.get(lit, ())))
+        for other in list(self.index.get(rarest, ())):
+            if len(other) > len(clause) and clause <= other:
+                self.drop(other)
+                self.stats["subsumed"] += 1
+
+        self.clauses.add(clause)
+        for lit in clause:
+            self.index.setdefault(lit, set()).add(clause)
+
+    def drop(self, clause):
+        self.clauses.discard(clause)
+        for lit in clause:
+            self.index[lit].discard(clause)
+
+    def offer(self, clause):
+        """
+        Adds a clause to the knowledge's clauses, unless subsumed.
+        """
+        if self.subsumed(clause):
+            self.stats["subsumed"] += 1
+        else:
+            self.keep(clause)
+
+    def push(self, clause):
+        """
+        Adds a clause to the set of support.
+        """
+        heapq.heappush(self.support, (len(clause), next(self.counter), clause))
+
+    def refute(self):
+        """
+        Resolves the set of support against the kept clauses until
+        deriving the empty clause, returning True, or until there is
+        nothing left to resolve, returning False.
+        """
+        while self.support:
+            _, _, given = heapq.heappop(self.support)
+            if self.subsumed(given):
+                self.stats["subsumed"] += 1
+                continue
+
+            for lit in given:
+                for other in list(self.index.get(-lit, ())):
+                    resolvent = (given - {lit}) | (other - {-lit})
+                    if any(-other_lit in resolvent
+                           for other_lit in resolvent):
+                        continue
+                    self.stats["generated"] += 1
+                    if not resolvent:
+                        return True
+                    if self.subsumed(resolvent):
+                        self.stats["subsumed"] += 1
+                    else:
+                        self.push(resolvent)
+
+            # Clauses of the set of support popped later resolve with it
+            self.keep(given)
+        return False
+
+
+def entails(knowledge, query, stats=None):
+    """
+    Checks if knowledge base entails query by resolution, refuting the
+    knowledge with the query's negation as the set of support.
+
+    If a `stats` dict is given, stores the number of resolvents
+    generated, of clauses deleted as subsumed, and the seconds taken.
+    """
+    start = time.perf_counter()
+    cnf = CNF()
+    cnf.add(knowledge)
+
+    # The clauses defining the query's literal hold in some model of any
+    # knowledge, so they join the knowledge's side
+    query_literal = cnf.literal(query)
+
+    prover = Prover()
+    entailed = False
+    for clause in map(frozenset, cnf.clauses):
+        if not clause:
+            entailed = True
+        elif not any(-lit in clause for lit in clause):
+            prover.offer(clause)
+    if not entailed:
+        prover.push(frozenset([-query_literal]))
+        entailed = prover.refute()
+
+    if stats is not None:
+        stats.update(prover.stats)
+        stats["seconds"] = time.perf_counter() - start
+    return entailed
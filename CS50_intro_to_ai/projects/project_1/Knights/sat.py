@@ -0,0 +1,478 @@
+"""
+Entailment by satisfiability: knowledge entails query exactly when
+knowledge ∧ ¬query has no model.
+
+Sentences are turned into clauses with the Tseitin encoding, which adds
+one variable per connective instead of multiplying clauses out, and the
+clauses are solved by a CDCL solver: unit propagation over two watched
+literals per clause, conflict analysis learning a clause at the first
+unique implication point, and non-chronological backjumping.
+
+Clauses are lists of nonzero integers, as in the DIMACS format: variable
+v is the literal v, and its negation is -v.
+"""
+import heapq
+
+from logic import And, Biconditional, Implication, Not, Or, Sentence, Symbol
+
+
+class CNF():
+    """
+    Clauses equivalent to the sentences added, with one variable per
+    symbol (`variables` maps symbol names to them) and one per
+    connective.
+    """
+
+    def __init__(self):
+        self.variables = {}
+        self.clauses = []
+        self.count = 0
+
+        # Literals of the sentences already encoded, by id, keeping
+        # the sentences alive so that ids aren't reused
+        self.literals = {}
+        self.encoded = []
+
+    def new_variable(self):
+        self.count += 1
+        return self.count
+
+    def add(self, sentence):
+        """
+        Adds clauses asserting `sentence`. Conjunctions and disjunctions
+        at the top are asserted directly, without a variable of their own.
+        """
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.clauses.append([self.literal(disjunct)
+                                 for disjunct in sentence.disjuncts])
+        elif isinstance(sentence, Implication):
+            self.clauses.append([-self.literal(sentence.antecedent),
+                                 self.literal(sentence.consequent)])
+        else:
+            self.clauses.append([self.literal(sentence)])
+
+    def literal(self, sentence):
+        """
+        Returns a literal that is true exactly when `sentence` is,
+        adding the clauses defining it.
+        """
+        if isinstance(sentence, Symbol):
+            variable = self.variables.get(sentence.name)
+            if variable is None:
+                variable = self.variables[sentence.name] = self.new_variable()
+            return variable
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+
+        key = id(sentence)
+        if key in self.literals:
+            return self.literals[key]
+
+        if isinstance(sentence, And):
+            parts = [self.literal(conjunct) for conjunct in sentence.conjuncts]
+            v = self.new_variable()
+            for part in parts:
+                self.clauses.append([-v, part])
+            self.clauses.append([v] + [-part for part in parts])
+        elif isinstance(sentence, (Or, Implication)):
+            if isinstance(sentence, Or):
+                parts = [self.literal(disjunct)
+                         for disjunct in sentence.disjuncts]
+            else:
+                parts = [-self.literal(sentence.antecedent),
+                         self.literal(sentence.consequent)]
+            v = self.new_variable()
+            self.clauses.append([-v] + parts)
+            for part in parts:
+                self.clauses.append([v, -part])
+        elif isinstance(sentence, Biconditional):
+            left = self.literal(sentence.left)
+            right = self.literal(sentence.right)
+            v = self.new_variable()
+            self.clauses.append([-v, -left, right])
+            self.clauses.append([-v, left, -right])
+            self.clauses.append([v, left, right])
+            self.clauses.append([v, -left, -right])
+        else:
+            raise TypeError("must be a logical sentence")
+
+        self.literals[key] = v
+        self.encoded.append(sentence)
+        return v
+
+
+class Solver():
+    """
+    CDCL SAT solver. Clauses can be added between calls to `solve`,
+    and what was learnt solving stays for the next call.
+    """
+
+    def __init__(self):
+
+        # False once the clauses are known to be unsatisfiable
+        self.ok = True
+
+        self.clauses = []
+        self.learnts = []
+
+        # Each clause of two or more literals is watched by its first
+        # two; watches[lit] lists the clauses watched by lit
+        self.watches = {}
+
+        # Assignment: value, decision level and reason (the clause that
+        # implied it, None for decisions) of each assigned variable,
+        # in the order assigned on `trail`
+        self.values = {}
+        self.levels = {}
+        self.reasons = {}
+        self.trail = []
+        self.trail_limits = []
+        self.head = 0
+
+        # Variable order: activity bumped by conflicts, and the value
+        # each variable last had
+        self.activity = {}
+        self.increment = 1.0
+        self.phase = {}
+        self.order = []
+
+        self.model = None
+        self.stats = {"decisions": 0, "propagations": 0, "conflicts": 0,
+                      "learnt": 0, "restarts": 0}
+
+    def add_clause(self, clause):
+        """
+        Adds a clause, a list of nonzero integer literals.
+        Returns False if the clauses became unsatisfiable.
+        """
+        if not self.ok:
+            return False
+        self.backtrack(0)
+
+        literals = []
+        for lit in clause:
+            self.add_variable(abs(lit))
+            value = self.value(lit)
+            if value is True or -lit in literals:
+                return True
+            if value is None and lit not in literals:
+                literals.append(lit)
+
+        if not literals:
+            self.ok = False
+        elif len(literals) == 1:
+            self.assign(literals[0], None)
+            if self.propagate() is not None:
+                self.ok = False
+        else:
+            self.clauses.append(literals)
+            self.watch(literals)
+        return self.ok
+
+    def add_variable(self, variable):
+        if variable not in self.activity:
+            self.activity[variable] = 0.0
+            heapq.heappush(self.order, (0.0, variable))
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses are satisfiable with every literal of
+        `assumptions` true, storing a satisfying assignment (variable to
+        bool) in `model`, and False otherwise.
+        """
+        self.model = None
+        if not self.ok:
+            return False
+        for lit in assumptions:
+            self.add_variable(abs(lit))
+
+        restart_after = 100
+        conflicts = 0
+        try:
+            while True:
+                conflict = self.propagate()
+                if conflict is not None:
+                    self.stats["conflicts"] += 1
+                    if not self.trail_limits:
+                        self.ok = False
+                        return False
+                    learnt, level = self.analyze(conflict)
+                    self.backtrack(level)
+                    if len(learnt) == 1:
+                        self.assign(learnt[0], None)
+                    else:
+                        self.learnts.append(learnt)
+                        self.watch(learnt)
+                        self.assign(learnt[0], learnt)
+                    self.stats["learnt"] += 1
+                    self.increment /= 0.95
+
+                    conflicts += 1
+                    if conflicts == restart_after:
+                        self.stats["restarts"] += 1
+                        self.backtrack(0)
+                        conflicts = 0
+                        restart_after = restart_after * 3 // 2
+                    continue
+
+                # Decide the assumptions first, one level each
+                level = len(self.trail_limits)
+                if level < len(assumptions):
+                    lit = assumptions[level]
+                    value = self.value(lit)
+                    if value is False:
+                        return False
+                    self.trail_limits.append(len(self.trail))
+                    if value is None:
+                        self.assign(lit, None)
+                    continue
+
+                variable = self.pick()
+                if variable is None:
+                    self.model = dict(self.values)
+                    return True
+                self.stats["decisions"] += 1
+                self.trail_limits.append(len(self.trail))
+                self.assign(variable if self.phase.get(variable)
+                            else -variable, None)
+        finally:
+            self.backtrack(0)
+
+    def value(self, lit):
+        """
+        Returns True or False for an assigned literal, None otherwise.
+        """
+        value = self.values.get(abs(lit))
+        if value is None:
+            return None
+        return value == (lit > 0)
+
+    def assign(self, lit, reason):
+        variable = abs(lit)
+        self.values[variable] = lit > 0
+        self.levels[variable] = len(self.trail_limits)
+        self.reasons[variable] = reason
+        self.trail.append(lit)
+
+    def watch(self, clause):
+        self.watches.setdefault(clause[0], []).append(clause)
+        self.watches.setdefault(clause[1], []).append(clause)
+
+    def propagate(self):
+        """
+        Assigns the literals implied by unit clauses until there are no
+        more, returning a clause made false if there is a conflict.
+        """
+        values = self.values
+        while self.head < len(self.trail):
+            false_lit = -self.trail[self.head]
+            self.head += 1
+            self.stats["propagations"] += 1
+
+            watching = self.watches.get(false_lit, [])
+            kept = []
+            self.watches[false_lit] = kept
+            for position, clause in enumerate(watching):
+
+                # Keep the false literal second
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = clause[0]
+                first_value = values.get(abs(first))
+                if first_value is not None and first_value == (first > 0):
+                    kept.append(clause)
+                    continue
+
+                # Watch another literal that isn't false, if any
+                for k in range(2, len(clause)):
+                    lit = clause[k]
+                    value = values.get(abs(lit))
+                    if value is None or value == (lit > 0):
+                        clause[1], clause[k] = lit, false_lit
+                        self.watches.setdefault(lit, []).append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if first_value is not None:
+                        kept.extend(watching[position + 1:])
+                        self.head = len(self.trail)
+                        return clause
+                    self.assign(first, clause)
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns the clause learnt from a conflict, asserting literal
+        first, and the level to backjump to.
+        """
+        level = len(self.trail_limits)
+        learnt = [None]
+        seen = set()
+        pending = 0
+        index = len(self.trail) - 1
+        clause, lit = conflict, None
+        while True:
+            for other in clause:
+                variable = abs(other)
+                if other == lit or variable in seen:
+                    continue
+                if self.levels[variable] > 0:
+                    seen.add(variable)
+                    self.bump(variable)
+                    if self.levels[variable] == level:
+                        pending += 1
+                    else:
+                        learnt.append(other)
+
+            # The latest assigned literal involved in the conflict
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reasons[abs(lit)]
+
+        learnt[0] = -lit
+        if len(learnt) == 1:
+            return learnt, 0
+
+        # Watch the literal of the highest level after the asserting one
+        deepest = max(range(1, len(learnt)),
+                      key=lambda i: self.levels[abs(learnt[i])])
+        learnt[1], learnt[deepest] = learnt[deepest], learnt[1]
+        return learnt, self.levels[abs(learnt[1])]
+
+    def bump(self, variable):
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            for other in self.activity:
+                self.activity[other] *= 1e-100
+            self.increment *= 1e-100
+            self.order = [(-activity, other) for other, activity
+                          in self.activity.items()
+                          if other not in self.values]
+            heapq.heapify(self.order)
+        elif variable not in self.values:
+            heapq.heappush(self.order, (-self.activity[variable], variable))
+
+    def pick(self):
+        """
+        Returns the unassigned variable of highest activity, or None.
+        """
+        while self.order:
+            _, variable = heapq.heappop(self.order)
+            if variable not in self.values:
+                return variable
+        return None
+
+    def backtrack(self, level):
+        """
+        Undoes the assignments of decision levels above `level`.
+        """
+        if len(self.trail_limits) <= level:
+            return
+        start = self.trail_limits[level]
+        for lit in self.trail[start:]:
+            variable = abs(lit)
+            self.phase[variable] = lit > 0
+            del self.values[variable]
+            del self.reasons[variable]
+            heapq.heappush(self.order, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.trail_limits[level:]
+        self.head = len(self.trail)
+
+
+def entails(knowledge, query, stats=None):
+    """
+    Checks if knowledge base entails query, by asking the solver for a
+    model of the knowledge in which the query is false.
+
+    If a `stats` dict is given, stores the solver's counts of decisions,
+    propagations, conflicts, learnt clauses and restarts, and the size
+    of the encoding.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    query_literal = cnf.literal(query)
+
+    solver = Solver()
+    for clause in cnf.clauses:
+        solver.add_clause(clause)
+    entailed = not solver.solve([-query_literal])
+
+    if stats is not None:
+        stats.update(solver.stats)
+        stats.update(variables=cnf.count, clauses=len(cnf.clauses))
+    return entailed
+
+
+class KnowledgeBase():
+    """
+    Knowledge to add sentences to and query as it grows. Each sentence
+    is encoded once, into a solver that keeps its clauses and what it
+    learnt from one query to the next; `knowledge` holds the sentences
+    added as a conjunction.
+    """
+
+    def __init__(self, *sentences):
+        self.knowledge = And()
+        self.cnf = CNF()
+        self.solver = Solver()
+        self.loaded = 0
+
+        # Queries found entailed, which adding knowledge can't change
+        self.entailed = set()
+
+        for sentence in sentences:
+            self.add(sentence)
+
+    def add(self, sentence):
+        """
+        Adds a sentence to the knowledge.
+        """
+        self.knowledge.add(sentence)
+        self.cnf.add(sentence)
+        self.load()
+
+    def load(self):
+        """
+        Passes the clauses encoded since the last call to the solver.
+        """
+        for clause in self.cnf.clauses[self.loaded:]:
+            self.solver.add_clause(clause)
+        self.loaded = len(self.cnf.clauses)
+
+    def entails(self, query, stats=None):
+        """
+        Checks if the knowledge entails query. If a `stats` dict is
+        given, stores the solver's counts for this query, as `entails`.
+        """
+        query = Sentence.share(query)
+        if query in self.entailed:
+            return True
+
+        before = dict(self.solver.stats)
+        query_literal = self.cnf.literal(query)
+        self.load()
+        entailed = not self.solver.solve([-query_literal])
+        if entailed:
+            self.entailed.add(query)
+
+        if stats is not None:
+            stats.update({name: count - before[name]
+                          for name, count in self.solver.stats.items()})
+            stats.update(variables=self.cnf.count,
+                         clauses=len(self.cnf.clauses))
+        return entailed
+
+    def consistent(self):
+        """
+        Returns True if the knowledge has a model, False otherwise.
+        """
+        return self.solver.solve()
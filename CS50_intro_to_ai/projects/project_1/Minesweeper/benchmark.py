@@ -0,0 +1,82 @@
+"""
+Times MinesweeperAI playing whole games on expert boards (16x30 with
+99 mines) with the set-based Sentence and with BitSentence, checking
+that both play the same moves.
+
+Usage: python benchmark.py [games]
+"""
+import random
+import sys
+import time
+
+from minesweeper import BitSentence, Minesweeper, MinesweeperAI, Sentence
+
+HEIGHT = 16
+WIDTH = 30
+MINES = 99
+
+
+def play(seed, sentence_class, height=HEIGHT, width=WIDTH, mines=MINES):
+    """
+    Plays the game of `seed` to the end. Returns whether it was won, the
+    moves made, and the seconds spent in add_knowledge.
+
+    Moves don't depend on the sentence class: the lowest cell known to
+    be safe if there is one, else a random choice (seeded too) among
+    the cells neither played nor known to be mines.
+    """
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = MinesweeperAI(height=height, width=width,
+                       sentence_class=sentence_class)
+    rng = random.Random(seed)
+
+    moves = []
+    seconds = 0
+    while len(ai.moves_made) < height * width - mines:
+        safes = ai.safes - ai.moves_made
+        if safes:
+            move = min(safes)
+        else:
+            move = rng.choice([(i, j) for i in range(height)
+                               for j in range(width)
+                               if (i, j) not in ai.mines
+                               and (i, j) not in ai.moves_made])
+        moves.append(move)
+        if game.is_mine(move):
+            return False, moves, seconds
+
+        start = time.perf_counter()
+        ai.add_knowledge(move, game.nearby_mines(move))
+        seconds += time.perf_counter() - start
+    return True, moves, seconds
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python benchmark.py [games]")
+    games = int(sys.argv[1]) if len(sys.argv) == 2 else 50
+
+    results = {}
+    for sentence_class in (Sentence, BitSentence):
+        results[sentence_class] = [play(seed, sentence_class)
+                                   for seed in range(games)]
+    played = {sentence_class: [(won, moves) for won, moves, _ in games_played]
+              for sentence_class, games_played in results.items()}
+    if played[Sentence] != played[BitSentence]:
+        raise Exception("Sentence and BitSentence played differently")
+
+    slow = None
+    for sentence_class, games_played in results.items():
+        seconds = sum(result[2] for result in games_played)
+        moves = sum(len(result[1]) for result in games_played)
+        wins = sum(result[0] for result in games_played)
+        slow = slow or seconds
+        print(f"{sentence_class.__name__}: {wins}/{len(games_played)} won, "
+              f"{1000 * seconds / len(games_played):.1f} ms per game, "
+              f"{1e6 * seconds / moves:.0f} us per add_knowledge, "
+              f"{slow / seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
-import itertools
+import math
 import random
-from copy import deepcopy
+
+# Most search nodes an exact count of the mine configurations of a
+# frontier component may take before make_best_guess samples SAMPLES
+# configurations instead, each search for one taking at most
+# SAMPLE_LIMIT nodes; this bounds the time a guess takes
+ENUMERATION_LIMIT = 20000
+SAMPLES = 200
+SAMPLE_LIMIT = 500
 
 class Minesweeper():
     """
@@ -102,12 +109,34 @@ class Sentence():
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
+    def __len__(self):
+        return len(self.cells)
+
+    def key(self):
+        """
+        Returns a hashable value identifying the sentence's cells.
+        """
+        return frozenset(self.cells)
+
+    def issubset(self, other):
+        """
+        Returns True if every cell of this sentence is in `other`.
+        """
+        return self.cells <= other.cells
+
+    def difference(self, other):
+        """
+        Returns the sentence about the cells of this sentence not in
+        `other`, whose cells must be a subset of this sentence's.
+        """
+        return Sentence(self.cells - other.cells, self.count - other.count)
+
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
         """
         return self.cells if len(self.cells) == self.count else set()
-        
+
     def known_safes(self):
         """
         Returns the set of all cells in self.cells known to be safe.
@@ -132,16 +161,214 @@ class Sentence():
             self.cells.remove(cell)
 
 
+# Bit of each cell in the masks of BitSentence, given out as cells are
+# first seen, so that the cells of a board take the lowest bits; and
+# the cell of each bit
+cell_bits = {}
+bit_cells = []
+
+
+def cell_bit(cell):
+    """
+    Returns the mask of the bit standing for a cell.
+    """
+    bit = cell_bits.get(cell)
+    if bit is None:
+        bit = cell_bits[cell] = 1 << len(bit_cells)
+        bit_cells.append(cell)
+    return bit
+
+
+class BitSentence():
+    """
+    Logical statement about a Minesweeper game, as Sentence, with its
+    cells held as the bits of an integer `mask` (see `cell_bit`), so
+    that comparing and updating sentences are integer operations.
+    """
+
+    def __init__(self, cells, count):
+        self.mask = 0
+        for cell in cells:
+            self.mask |= cell_bit(cell)
+        self.count = count
+
+        # The mask last decoded by `cells`, and its cells
+        self.decoded = None
+
+    @classmethod
+    def from_mask(cls, mask, count):
+        sentence = cls.__new__(cls)
+        sentence.mask = mask
+        sentence.count = count
+        sentence.decoded = None
+        return sentence
+
+    @property
+    def cells(self):
+        """
+        The set of the sentence's cells, decoded from the mask the first
+        time it's asked for.
+        """
+        if self.decoded is None or self.decoded[0] != self.mask:
+            cells = set()
+            mask = self.mask
+            while mask:
+                low = mask & -mask
+                cells.add(bit_cells[low.bit_length() - 1])
+                mask ^= low
+            self.decoded = (self.mask, frozenset(cells))
+        return self.decoded[1]
+
+    def __eq__(self, other):
+        return self.mask == other.mask and self.count == other.count
+
+    def __str__(self):
+        return f"{self.cells} = {self.count}"
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def key(self):
+        """
+        Returns a hashable value identifying the sentence's cells.
+        """
+        return self.mask
+
+    def issubset(self, other):
+        """
+        Returns True if every cell of this sentence is in `other`.
+        """
+        return not self.mask & ~other.mask
+
+    def difference(self, other):
+        """
+        Returns the sentence about the cells of this sentence not in
+        `other`, whose cells must be a subset of this sentence's.
+        """
+        return BitSentence.from_mask(self.mask & ~other.mask,
+                                     self.count - other.count)
+
+    def known_mines(self):
+        """
+        Returns the set of all cells in self.cells known to be mines.
+        """
+        if self.mask.bit_count() == self.count:
+            return self.cells
+        return set()
+
+    def known_safes(self):
+        """
+        Returns the set of all cells in self.cells known to be safe.
+        """
+        return self.cells if self.count == 0 else set()
+
+    def mark_mine(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be a mine.
+        """
+        bit = cell_bits.get(cell, 0)
+        if self.mask & bit:
+            self.mask ^= bit
+            self.count -= 1
+
+    def mark_safe(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be safe.
+        """
+        self.mask &= ~cell_bits.get(cell, 0)
+
+
+class LimitReached(Exception):
+    """
+    Raised by `search_configurations` after its limit of nodes.
+    """
+
+
+def search_configurations(cells, constraints, limit, rng=None):
+    """
+    Searches the assignments of mines to `cells` meeting every
+    constraint, a pair (cells, count) requiring count mines among those
+    cells, by backtracking over the cells in order.
+
+    Returns (totals, counts): totals[k] is the number of assignments with
+    k mines, and counts[k][i] the number of those with a mine at cells[i].
+
+    Without `rng`, every assignment is counted, raising LimitReached
+    after `limit` nodes. With it, values are tried in random order and
+    the search stops at the first assignment found, returning empty
+    dicts if there is none within `limit` nodes.
+    """
+    position = {cell: i for i, cell in enumerate(cells)}
+    constraints_of = [[] for _ in cells]
+    needed = []
+    unassigned = []
+    for c, (members, count) in enumerate(constraints):
+        needed.append(count)
+        unassigned.append(len(members))
+        for cell in members:
+            constraints_of[position[cell]].append(c)
+
+    assignment = [0] * len(cells)
+    totals = {}
+    counts = {}
+    nodes = 0
+
+    def search(i, mines):
+        nonlocal nodes
+        nodes += 1
+        if nodes > limit:
+            raise LimitReached
+        if i == len(cells):
+            totals[mines] = totals.get(mines, 0) + 1
+            row = counts.setdefault(mines, [0] * len(cells))
+            for j, value in enumerate(assignment):
+                row[j] += value
+            return rng is not None
+
+        values = (0, 1) if rng is None or rng.random() < 0.5 else (1, 0)
+        for value in values:
+            consistent = True
+            for c in constraints_of[i]:
+                unassigned[c] -= 1
+                needed[c] -= value
+                if needed[c] < 0 or needed[c] > unassigned[c]:
+                    consistent = False
+            if consistent:
+                assignment[i] = value
+                found = search(i + 1, mines + value)
+            for c in constraints_of[i]:
+                unassigned[c] += 1
+                needed[c] += value
+            assignment[i] = 0
+            if consistent and found:
+                return True
+        return False
+
+    try:
+        search(0, 0)
+    except LimitReached:
+        if rng is None:
+            raise
+    return totals, counts
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, sentence_class=Sentence,
+                 mines=None):
 
-        # Set initial height and width
+        # Set initial height and width, and the number of mines if known
         self.height = height
         self.width = width
+        self.total_mines = mines
+
+        # Class of the sentences made, Sentence or BitSentence
+        self.sentence_class = sentence_class
 
         # Keep track of which cells have been clicked on
         self.moves_made = set()
@@ -150,8 +377,39 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Sentences about the game known to be true, by id, the ids of
+        # the sentences each cell is in, and the id of each sentence's
+        # set of cells
+        self.sentences = {}
+        self.cell_index = {}
+        self.ids = {}
+        self.next_id = 0
+
+        # Ids of the sentences changed since inferences were last drawn
+        # from them, and the number of changes to the knowledge so far
+        self.pending = set()
+        self.changes = 0
+
+        # Mine configurations of the frontier components searched by
+        # make_best_guess, by their sentences
+        self.configurations = {}
+        self.rng = random.Random()
+
+    @property
+    def knowledge(self):
+        """
+        List of sentences about the game known to be true.
+        """
+        return list(self.sentences.values())
+
+    @knowledge.setter
+    def knowledge(self, sentences):
+        self.sentences = {}
+        self.cell_index = {}
+        self.ids = {}
+        self.pending = set()
+        for sentence in sentences:
+            self.add_sentence(sentence)
 
     def mark_mine(self, cell):
         """
@@ -159,8 +417,9 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self.changes += 1
+        for sentence_id in self.cell_index.pop(cell, ()):
+            self.update(sentence_id, lambda sentence: sentence.mark_mine(cell))
 
     def mark_safe(self, cell):
         """
@@ -168,24 +427,66 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
-    
-    def get_neighbors(self, cell, count):
-        neighbors = set()
-        for x in range(cell[0]-1, cell[0]+2):
-            for y in range(cell[1]-1, cell[1]+2):
-                if ((x != cell[0] or y != cell[1]) and
-                    (0 <= x < self.width) and
-                    (0 <= y < self.height) and
-                    ((x,y) not in self.safes)):
+        self.changes += 1
+        for sentence_id in self.cell_index.pop(cell, ()):
+            self.update(sentence_id, lambda sentence: sentence.mark_safe(cell))
 
-                    if (x,y) in self.mines:
-                        count -= 1
-                    else:
-                        neighbors.add((x,y))
+    def update(self, sentence_id, change):
+        """
+        Applies `change` to a sentence, keeping `ids` up to date, and
+        queues the sentence to draw inferences from again.
+        """
+        sentence = self.sentences[sentence_id]
+        key = sentence.key()
+        if self.ids.get(key) == sentence_id:
+            del self.ids[key]
+        change(sentence)
+        self.ids.setdefault(sentence.key(), sentence_id)
+        self.pending.add(sentence_id)
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge, unless it has no cells or
+        there's already a sentence about the same cells.
+        """
+        key = sentence.key()
+        if not len(sentence) or key in self.ids:
+            return
+        sentence_id = self.next_id
+        self.next_id += 1
+        self.sentences[sentence_id] = sentence
+        self.ids[key] = sentence_id
+        for cell in sentence.cells:
+            self.cell_index.setdefault(cell, set()).add(sentence_id)
+        self.pending.add(sentence_id)
+        self.changes += 1
+
+    def remove_sentence(self, sentence_id):
+        sentence = self.sentences.pop(sentence_id)
+        key = sentence.key()
+        if self.ids.get(key) == sentence_id:
+            del self.ids[key]
+        for cell in sentence.cells:
+            self.cell_index[cell].discard(sentence_id)
+        self.pending.discard(sentence_id)
+        self.changes += 1
 
-        return (neighbors, count)
+    def get_neighbors(self, cell, count):
+        """
+        Returns the neighbors of a cell not yet known to be safe or
+        mines, and `count` less the neighbors known to be mines.
+        """
+        neighbors = set()
+        for i in range(cell[0] - 1, cell[0] + 2):
+            for j in range(cell[1] - 1, cell[1] + 2):
+                if ((i, j) == cell or not 0 <= i < self.height
+                        or not 0 <= j < self.width or (i, j) in self.safes):
+                    continue
+                if (i, j) in self.mines:
+                    count -= 1
+                else:
+                    neighbors.add((i, j))
+        return neighbors, count
 
     def add_knowledge(self, cell, count):
         """
@@ -203,42 +504,56 @@ class MinesweeperAI():
                if they can be inferred from existing knowledge
         """
         self.moves_made.add(cell)
-        self.mark_safe(cell)
-
-        neighbors, new_count = self.get_neighbors(cell, count)
-
-        if len(neighbors) > 0:
-            new_sentence = Sentence(neighbors,new_count)
-            self.knowledge.append(new_sentence)
-
-            while True:
-                knowledge_copy = deepcopy(self.knowledge)
-                for sentence in self.knowledge:
-                    sentence.mark_safe(cell)
-                    intersection_mines = sentence.cells.intersection(
-                                            self.mines)
-                    sentence.cells.difference_update(self.mines)
-                    sentence.cells.difference_update(self.safes)
-                    sentence.count -= len(intersection_mines)
-                    self.mines = self.mines.union(sentence.known_mines())
-                    self.safes = self.safes.union(sentence.known_safes())
-                
-                for s1, s2 in itertools.permutations(self.knowledge, 2):
-                    
-                    if s1.cells.issubset(s2.cells):
-                        difference_set = s2.cells.difference(s1.cells)
-                        difference_count = s2.count - s1.count
-                        if s2 in self.knowledge:
-                            self.knowledge.remove(s2)
-
-                        if len(difference_set) != 0:
-                            self.knowledge.append(
-                                Sentence(difference_set,difference_count))
-                if knowledge_copy == self.knowledge:
+        if cell not in self.safes:
+            self.mark_safe(cell)
+
+        neighbors, count = self.get_neighbors(cell, count)
+        self.add_sentence(self.sentence_class(neighbors, count))
+        self.infer()
+
+    def infer(self):
+        """
+        Draws inferences from the sentences in `pending` until there
+        are no more. A sentence only needs another look when it changed,
+        and is only compared with the sentences sharing a cell with it.
+        """
+        while self.pending:
+            sentence_id = self.pending.pop()
+            sentence = self.sentences[sentence_id]
+
+            # Cells whose kind the sentence settles
+            mines = sentence.known_mines()
+            safes = sentence.known_safes()
+            if not len(sentence) or mines or safes:
+                self.remove_sentence(sentence_id)
+                for mine in list(mines):
+                    self.mark_mine(mine)
+                for safe in list(safes):
+                    self.mark_safe(safe)
+                continue
+
+            # If one sentence's cells are a subset of another's, the
+            # other's remaining cells hold the difference of the counts
+            related = set()
+            for cell in sentence.cells:
+                related.update(self.cell_index[cell])
+            related.discard(sentence_id)
+            for other_id in related:
+                other = self.sentences.get(other_id)
+                if other is None:
+                    continue
+                if sentence.issubset(other):
+                    subset, superset = sentence, other_id
+                elif other.issubset(sentence):
+                    subset, superset = other, sentence_id
+                else:
+                    continue
+                difference = self.sentences[superset].difference(subset)
+                self.remove_sentence(superset)
+                self.add_sentence(difference)
+                if superset == sentence_id:
                     break
-                        
-                
-                
+
     def make_safe_move(self):
         """
         Returns a safe cell to choose on the Minesweeper board.
@@ -262,14 +577,182 @@ class MinesweeperAI():
             1) have not already been chosen, and
             2) are not known to be mines
         """
-        
-        mines_and_moves = self.mines.union(self.moves_made)
+        possible_moves = [(i, j) for i in range(self.height)
+                          for j in range(self.width)
+                          if (i, j) not in self.mines
+                          and (i, j) not in self.moves_made]
 
-        possible_moves = [(x,y) for x in range(self.width) 
-                            for y in range(self.height)
-                            if (x,y) not in (mines_and_moves)]
-        
         if len(possible_moves) != 0:
             return random.choice(possible_moves)
         else:
-            pass
\ No newline at end of file
+            pass
+
+    def make_best_guess(self):
+        """
+        Returns the move least likely to be a mine (see
+        `mine_probabilities`) among the cells that have not already been
+        chosen and are not known to be mines, or None if there is none.
+        """
+        probabilities = self.mine_probabilities()
+        if not probabilities:
+            return None
+        return min(probabilities, key=lambda cell: (probabilities[cell], cell))
+
+    def mine_probabilities(self):
+        """
+        Returns the probability that each cell that hasn't been chosen
+        and isn't known to be a mine is a mine.
+
+        The cells of the sentences form the frontier, split into
+        components that share no sentence, whose mine configurations are
+        counted independently (see `component_configurations`). With the
+        number of mines on the board known, a configuration of k mines
+        is weighted by the ways of placing the other mines on the cells
+        off the frontier, and those cells share the mines expected to be
+        left; without it, configurations weigh the same and the cells
+        off the frontier take the frontier's average probability.
+        """
+        components = self.frontier_components()
+        results = [self.component_configurations(sentences)
+                   for sentences in components]
+        frontier = set()
+        for cells, _, _ in results:
+            frontier.update(cells)
+        others = [(i, j) for i in range(self.height) for j in range(self.width)
+                  if (i, j) not in frontier and (i, j) not in self.mines
+                  and (i, j) not in self.moves_made]
+
+        probabilities = {cell: 0.0 for cell in others if cell in self.safes}
+        others = [cell for cell in others if cell not in self.safes]
+
+        remaining = None
+        if self.total_mines is not None:
+            remaining = self.total_mines - len(self.mines)
+
+        def placements(frontier_mines):
+            """
+            Returns the ways of placing the remaining mines off the
+            frontier, given how many are on it.
+            """
+            rest = remaining - frontier_mines
+            return math.comb(len(others), rest) if rest >= 0 else 0
+
+        for c, (cells, totals, counts) in enumerate(results):
+            if remaining is None:
+                weights = {k: 1 for k in totals}
+            else:
+                elsewhere = convolve(result[1] for d, result
+                                     in enumerate(results) if d != c)
+                weights = {k: sum(ways * placements(mines + k)
+                                  for mines, ways in elsewhere.items())
+                           for k in totals}
+            total = sum(totals[k] * weights[k] for k in totals)
+            if not total:
+                weights = {k: 1 for k in totals}
+                total = sum(totals.values())
+            for i, cell in enumerate(cells):
+                probabilities[cell] = sum(
+                    counts[k][i] * weights[k] for k in totals) / total
+
+        if others:
+            if remaining is None:
+                frontier_probabilities = [probabilities[cell]
+                                          for cell in frontier]
+                p = (sum(frontier_probabilities) / len(frontier_probabilities)
+                     if frontier_probabilities else 0.5)
+            else:
+                everywhere = convolve(result[1] for result in results)
+                total = sum(ways * placements(mines)
+                            for mines, ways in everywhere.items())
+                expected = sum(ways * placements(mines) * (remaining - mines)
+                               for mines, ways in everywhere.items())
+                p = expected / total / len(others) if total else 0.5
+            for cell in others:
+                probabilities[cell] = p
+        return probabilities
+
+    def frontier_components(self):
+        """
+        Returns the sentences grouped in components: two sentences are
+        in the same component if a chain of sentences, each sharing a
+        cell with the next, joins them.
+        """
+        components = []
+        seen = set()
+        for start in self.sentences:
+            if start in seen:
+                continue
+            seen.add(start)
+            component = [start]
+            for sentence_id in component:
+                for cell in self.sentences[sentence_id].cells:
+                    for other_id in self.cell_index[cell]:
+                        if other_id not in seen:
+                            seen.add(other_id)
+                            component.append(other_id)
+            components.append([self.sentences[sentence_id]
+                               for sentence_id in component])
+        return components
+
+    def component_configurations(self, sentences):
+        """
+        Returns (cells, totals, counts) for the mine configurations of the
+        cells of a component's sentences, as `search_configurations`.
+
+        Counts are exact unless the search takes more than
+        ENUMERATION_LIMIT nodes, in which case they come from SAMPLES
+        random configurations. Either way they are remembered for as
+        long as the component's sentences don't change.
+        """
+        key = frozenset((sentence.key(), sentence.count)
+                        for sentence in sentences)
+        if key in self.configurations:
+            return self.configurations[key]
+
+        cells = sorted(set().union(*(sentence.cells
+                                     for sentence in sentences)))
+        constraints = [(sentence.cells, sentence.count)
+                       for sentence in sentences]
+        try:
+            totals, counts = search_configurations(
+                cells, constraints, ENUMERATION_LIMIT)
+        except LimitReached:
+            totals, counts = {}, {}
+            for _ in range(SAMPLES):
+                sample_totals, sample_counts = search_configurations(
+                    cells, constraints, SAMPLE_LIMIT, self.rng)
+                for k, row in sample_counts.items():
+                    totals[k] = totals.get(k, 0) + 1
+                    counts[k] = [a + b for a, b in
+                                 zip(counts.get(k, [0] * len(cells)), row)]
+        if not totals:
+
+            # No configuration found: estimate each cell's probability as
+            # the highest share of mines among the sentences it's in
+            estimates = [max(count / len(members)
+                             for members, count in constraints
+                             if cell in members)
+                         for cell in cells]
+            k = round(sum(estimates))
+            totals, counts = {k: 1}, {k: estimates}
+
+        if len(self.configurations) > 1000:
+            self.configurations.clear()
+        self.configurations[key] = (cells, totals, counts)
+        return self.configurations[key]
+
+
+def convolve(distributions):
+    """
+    Returns the distribution of the total number of mines over several
+    independent components, each a dict from a number of mines to its
+    number of configurations.
+    """
+    total = {0: 1}
+    for distribution in distributions:
+        combined = {}
+        for mines, ways in total.items():
+            for k, count in distribution.items():
+                combined[mines + k] = combined.get(mines + k, 0) + ways * count
+        total = combined
+    return total
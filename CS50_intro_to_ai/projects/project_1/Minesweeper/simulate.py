@@ -0,0 +1,133 @@
+"""
+Plays seeded games of Minesweeper with MinesweeperAI, without pygame,
+over a pool of processes, and reports the win rate, moves per second,
+time per add_knowledge call and how the knowledge base grows over a
+game. Game number i of a run is seeded with i, so runs with the same
+arguments play the same games and can be compared across changes.
+
+Usage: python simulate.py [games] [height] [width] [density] [workers]
+"""
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+# Move numbers at which the size of the knowledge base is reported
+CHECKPOINTS = (1, 5, 10, 25, 50, 100, 200, 400)
+
+
+def play(seed, height=16, width=30, mines=99):
+    """
+    Plays the game of `seed` to the end, making safe moves when there
+    are any and the AI's best guess otherwise. Returns a dict of the
+    outcome and its measurements: whether it was won, the moves and
+    guesses made, the seconds spent in the whole game and in
+    add_knowledge, and the number of sentences after each move.
+    """
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = MinesweeperAI(height=height, width=width, mines=mines)
+    ai.rng.seed(seed)
+
+    result = {"won": False, "moves": 0, "guesses": 0, "seconds": 0,
+              "knowledge_seconds": 0, "sizes": []}
+    start = time.perf_counter()
+    while len(ai.moves_made) < height * width - mines:
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_best_guess()
+            result["guesses"] += 1
+        result["moves"] += 1
+        if game.is_mine(move):
+            break
+
+        knowledge_start = time.perf_counter()
+        ai.add_knowledge(move, game.nearby_mines(move))
+        result["knowledge_seconds"] += time.perf_counter() - knowledge_start
+        result["sizes"].append(len(ai.sentences))
+    else:
+        result["won"] = True
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def play_game(args):
+    """
+    Calls `play` with a tuple of its arguments, for the pool.
+    """
+    return play(*args)
+
+
+def simulate(games, height, width, mines, workers=None):
+    """
+    Plays games seeded 0 to `games` - 1 over `workers` processes
+    (one per CPU by default) and returns their results in order.
+    """
+    tasks = [(seed, height, width, mines) for seed in range(games)]
+    if workers == 1:
+        return list(map(play_game, tasks))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(play_game, tasks,
+                             chunksize=max(1, games // (4 * (workers or 1)))))
+
+
+def report(results, seconds):
+    """
+    Prints a summary of the results of `simulate`, which took `seconds`.
+    """
+    games = len(results)
+    wins = sum(result["won"] for result in results)
+    moves = sum(result["moves"] for result in results)
+    guesses = sum(result["guesses"] for result in results)
+    calls = sum(len(result["sizes"]) for result in results)
+    playing = sum(result["seconds"] for result in results)
+    knowledge = sum(result["knowledge_seconds"] for result in results)
+
+    print(f"Won {wins} of {games} games ({100 * wins / games:.1f}%), "
+          f"{guesses / games:.1f} guesses per game.")
+    print(f"{moves} moves, {moves / playing:.0f} per second of play, "
+          f"{seconds:.2f} s in all.")
+    if calls:
+        print(f"add_knowledge: {1e6 * knowledge / calls:.0f} us per call, "
+              f"{100 * knowledge / playing:.0f}% of play.")
+
+    print("Sentences in the knowledge base after each number of moves:")
+    for checkpoint in CHECKPOINTS:
+        sizes = [result["sizes"][checkpoint - 1] for result in results
+                 if len(result["sizes"]) >= checkpoint]
+        if not sizes:
+            break
+        print(f"  {checkpoint:>4}: mean {sum(sizes) / len(sizes):.1f}, "
+              f"max {max(sizes)} ({len(sizes)} games)")
+
+
+def main():
+    usage = ("Usage: python simulate.py "
+             "[games] [height] [width] [density] [workers]")
+    if len(sys.argv) > 6:
+        sys.exit(usage)
+    args = sys.argv[1:]
+    games = int(args[0]) if len(args) > 0 else 100
+    height = int(args[1]) if len(args) > 1 else 16
+    width = int(args[2]) if len(args) > 2 else 30
+    density = float(args[3]) if len(args) > 3 else 99 / (16 * 30)
+    workers = int(args[4]) if len(args) > 4 else os.cpu_count()
+    if min(games, height, width, workers) < 1:
+        sys.exit(usage)
+
+    mines = round(density * height * width)
+    if not 0 < mines < height * width:
+        sys.exit("Density must leave both mines and safe cells.")
+
+    print(f"Playing {games} games of {height}x{width} with {mines} mines "
+          f"on {workers} processes.")
+    start = time.perf_counter()
+    results = simulate(games, height, width, mines, workers)
+    report(results, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()